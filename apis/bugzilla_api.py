@@ -6,9 +6,9 @@
 
 import os
 import json
-import requests
+from urllib.parse import quote
 
-from components.utilities import retry
+from components.utilities import retry, pooled_session
 
 
 def sq(s):
@@ -33,6 +33,28 @@ def is_prod(url):
     return "allizom" not in url
 
 
+class BugzillaClient:
+    """
+    The connection details for a Bugzilla instance, plus a pooled keep-alive
+    session that every API call below is made through.
+    """
+
+    def __init__(self, url, apikey, pool_size=10, timeout=60):
+        self.url = url
+        self.apikey = apikey
+        self.timeout = timeout
+        self.session = pooled_session(pool_size)
+
+    def get(self, path):
+        return self.session.get(self.url + path, timeout=self.timeout)
+
+    def put(self, path, json_data):
+        return self.session.put(self.url + path, json=json_data, timeout=self.timeout)
+
+    def post(self, path, json_data):
+        return self.session.post(self.url + path, json=json_data, timeout=self.timeout)
+
+
 def _load_json_or_raise(r, where: str):
     # Work off bytes, decode once, tolerate bad unicode, and truncate preview.
     raw = getattr(r, "content", b"") or b""
@@ -49,7 +71,7 @@ def _load_json_or_raise(r, where: str):
         ) from e
 
 
-def fileBug(url, apikey, ff_version, product, component, summary, description, cc_list, needinfo, see_also, depends_on, blocks, moco_confidential):
+def fileBug(client, ff_version, product, component, summary, description, cc_list, needinfo, see_also, depends_on, blocks, moco_confidential):
     assert isinstance(cc_list, list)
 
     data = {
@@ -65,7 +87,7 @@ def fileBug(url, apikey, ff_version, product, component, summary, description, c
         'cc': ['tom@mozilla.com', 'jewilde@mozilla.com'] + cc_list
     }
 
-    if is_prod(url):
+    if is_prod(client.url):
         data['cf_status_firefox' + str(ff_version)] = 'affected'
 
     if see_also:
@@ -88,7 +110,7 @@ def fileBug(url, apikey, ff_version, product, component, summary, description, c
                 'requestee': n
             })
 
-    r = requests.post(url + "bug?api_key=" + apikey, json=data)
+    r = client.post("bug?api_key=" + client.apikey, json_data=data)
 
     j = _load_json_or_raise(r, "fileBug")
 
@@ -98,7 +120,7 @@ def fileBug(url, apikey, ff_version, product, component, summary, description, c
     raise Exception(j)
 
 
-def commentOnBug(url, apikey, bugID, comment, needinfo=None, assignee=None):
+def commentOnBug(client, bugID, comment, needinfo=None, assignee=None):
     data = {
         'id': bugID,
         'comment': {'body': comment},
@@ -114,9 +136,9 @@ def commentOnBug(url, apikey, bugID, comment, needinfo=None, assignee=None):
             'requestee': needinfo
         }]
 
-    r = requests.put(
-        url + "bug/" + str(bugID) + "?api_key=" + apikey,
-        json=data
+    r = client.put(
+        "bug/" + str(bugID) + "?api_key=" + client.apikey,
+        json_data=data
     )
 
     j = _load_json_or_raise(r, "commentOnBug")
@@ -129,7 +151,7 @@ def commentOnBug(url, apikey, bugID, comment, needinfo=None, assignee=None):
     raise Exception(j)
 
 
-def closeBug(url, apikey, bugID, resolution, comment, dup_id=None):
+def closeBug(client, bugID, resolution, comment, dup_id=None):
     assert dup_id is None or resolution == 'DUPLICATE'
     data = {
         'id': bugID,
@@ -142,9 +164,9 @@ def closeBug(url, apikey, bugID, resolution, comment, dup_id=None):
     if dup_id:
         data['dup_id'] = dup_id
 
-    r = requests.put(
-        url + "bug/" + str(bugID) + "?api_key=" + apikey,
-        json=data
+    r = client.put(
+        "bug/" + str(bugID) + "?api_key=" + client.apikey,
+        json_data=data
     )
 
     j = _load_json_or_raise(r, "closeBug")
@@ -158,8 +180,13 @@ def closeBug(url, apikey, bugID, resolution, comment, dup_id=None):
 
 
 @retry
-def getBugComments(url, bugID):
-    r = requests.get(url + "bug/" + str(bugID) + "/comment")
+def getBugComments(client, bugID, new_since=None):
+    # Returns the comment objects (with at least 'text', and normally 'id' and
+    # 'creation_time') on the bug, optionally only those made after new_since.
+    path = "bug/" + str(bugID) + "/comment"
+    if new_since:
+        path += "?new_since=" + quote(new_since)
+    r = client.get(path)
 
     j = _load_json_or_raise(r, "getBugComments")
 
@@ -167,14 +194,34 @@ def getBugComments(url, bugID):
         bugs = j['bugs']
         bug_data = bugs.get(str(bugID), bugs.get(bugID, {}))
         comments = bug_data.get('comments', [])
-        return [c.get('text', '') for c in comments if isinstance(c, dict)]
+        return [c for c in comments if isinstance(c, dict)]
     except Exception as e:
         raise Exception(j) from e
 
 
+# Bug ids are sent comma-separated in the query string; keep each request's list of
+# them to this many characters so the URL stays well within server limits.
+BUG_ID_QUERY_MAX_LENGTH = 4000
+
+
+def chunkBugIDs(bugIDs, max_length=BUG_ID_QUERY_MAX_LENGTH):
+    chunk = []
+    length = 0
+    for b in bugIDs:
+        b_length = len(str(b)) + 1
+        if chunk and length + b_length > max_length:
+            yield chunk
+            chunk = []
+            length = 0
+        chunk.append(b)
+        length += b_length
+    if chunk:
+        yield chunk
+
+
 @retry
-def openBugsMetadata(url, bugIDs):
-    r = requests.get(url + "bug?resolution=---&id=%s&include_fields=id,assigned_to" % ",".join([str(b) for b in bugIDs]))
+def openBugsMetadata(client, bugIDs):
+    r = client.get("bug?resolution=---&id=%s&include_fields=id,assigned_to" % ",".join([str(b) for b in bugIDs]))
 
     j = _load_json_or_raise(r, "openBugsMetadata")
 
@@ -184,8 +231,8 @@ def openBugsMetadata(url, bugIDs):
         raise Exception(j) from e
 
 
-def markFFVersionAffected(url, apikey, bugID, ff_version, affected):
-    if not is_prod(url):
+def markFFVersionAffected(client, bugID, ff_version, affected):
+    if not is_prod(client.url):
         return
 
     data = {
@@ -193,9 +240,9 @@ def markFFVersionAffected(url, apikey, bugID, ff_version, affected):
         'cf_status_firefox' + str(ff_version): 'affected' if affected else 'unaffected'
     }
 
-    r = requests.put(
-        url + "bug/" + str(bugID) + "?api_key=" + apikey,
-        json=data
+    r = client.put(
+        "bug/" + str(bugID) + "?api_key=" + client.apikey,
+        json_data=data
     )
 
     j = _load_json_or_raise(r, "markFFVersionAffected")
@@ -206,3 +253,27 @@ def markFFVersionAffected(url, apikey, bugID, ff_version, affected):
                 return
 
     raise Exception(j)
+
+
+def markFFVersionsAffected(client, bugIDs, ff_version, affected):
+    # Bugzilla will apply one update to many bugs if we give it their ids
+    if not is_prod(client.url):
+        return
+
+    data = {
+        'ids': bugIDs,
+        'cf_status_firefox' + str(ff_version): 'affected' if affected else 'unaffected'
+    }
+
+    r = client.put(
+        "bug/" + str(bugIDs[0]) + "?api_key=" + client.apikey,
+        json_data=data
+    )
+
+    j = _load_json_or_raise(r, "markFFVersionsAffected")
+
+    if 'bugs' in j:
+        if set(b['id'] for b in j['bugs']) >= set(bugIDs):
+            return
+
+    raise Exception(j)
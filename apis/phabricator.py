@@ -3,11 +3,13 @@
 # This Source Code Form is subject to the terms of the Mozilla Public
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
+import os
 import re
 import json
 import platform
 
-from components.utilities import retry
+from components.utilities import retry, pooled_session
+from components.diskcache import DiskCache
 from components.logging import logEntryExit, LogLevel
 from components.providerbase import BaseProvider, INeedsCommandProvider, INeedsLoggingProvider
 
@@ -18,10 +20,62 @@ def _arc():
     return "arc"
 
 
-def quote_echo_string(s):
-    if platform.system() != "Windows":
-        return "'" + s + "'"
-    return s
+class ConduitError(Exception):
+    def __init__(self, method, error_code, error_info):
+        self.method = method
+        self.error_code = error_code
+        self.error_info = error_info
+        super().__init__("Conduit call %s failed with %s: %s" % (method, error_code, error_info))
+
+
+class ConduitClient:
+    """
+    Calls the Conduit API directly over HTTP, with a pooled keep-alive session,
+    rather than starting arc (and a shell) for every call. We only still use arc
+    for `arc diff`.
+
+    The API token is taken from the config if given, otherwise from the ~/.arcrc
+    that arc itself uses; it's only looked up on the first call.
+    """
+
+    def __init__(self, url, token=None, pool_size=4, timeout=60):
+        self.url = url
+        self._token = token
+        self.timeout = timeout
+        self.session = pooled_session(pool_size)
+
+    @property
+    def token(self):
+        if not self._token:
+            arcrc_path = os.path.join(os.path.expanduser("~"), ".arcrc")
+            try:
+                with open(arcrc_path, "r") as f:
+                    hosts = json.load(f)['hosts']
+                self._token = hosts[self.url + "api/"]['token']
+            except Exception as e:
+                raise Exception("No Phabricator apikey was configured and we could not find a token for %s in %s" % (self.url, arcrc_path)) from e
+        return self._token
+
+    def call(self, method, params):
+        params = dict(params, __conduit__={'token': self.token})
+        r = self.session.post(self.url + "api/" + method,
+                              data={'params': json.dumps(params), 'output': 'json', '__conduit__': 'true'},
+                              timeout=self.timeout)
+        try:
+            result = r.json()
+        except Exception:
+            raise Exception("Could not decode the response to %s as JSON: %s" % (method, r.text))
+
+        if result.get('error_code'):
+            raise ConduitError(method, result['error_code'], result.get('error_info'))
+        return result['result']
+
+    def search(self, method, constraints):
+        return self.call(method, {'constraints': constraints})['data']
+
+    def edit_revision(self, revision, transactions):
+        # Every transaction is applied to the revision in a single call
+        return self.call("differential.revision.edit", {'transactions': transactions, 'objectIdentifier': revision})
 
 
 class PhabricatorProvider(BaseProvider, INeedsCommandProvider, INeedsLoggingProvider):
@@ -36,6 +90,19 @@ class PhabricatorProvider(BaseProvider, INeedsCommandProvider, INeedsLoggingProv
         else:
             self.url = config['url']
 
+        self.conduit = ConduitClient(
+            self.url, config.get('apikey', None),
+            pool_size=config.get('http_pool_size', 4),
+            timeout=config.get('http_timeout', 60))
+
+        # The PHIDs of the users and projects we set as reviewers. They never change, so
+        # if phid_cache_path is configured we also keep them on disk between runs.
+        self._phids = {}
+        self.phid_cache = None
+        if config.get('phid_cache_path', None):
+            max_size = int(config.get('phid_cache_max_size_mb', 1)) * 1024 * 1024
+            self.phid_cache = DiskCache(config['phid_cache_path'], max_size)
+
     @logEntryExit
     def submit_patches(self, bug_id, has_patches):
         phab_revisions = []
@@ -83,119 +150,123 @@ class PhabricatorProvider(BaseProvider, INeedsCommandProvider, INeedsLoggingProv
         # Submit only a single patch
         phab_revisions.append(submit_to_phabricator("tip^"))
 
-        # Chain revisions together if needed
-        @retry
-        def chain_revisions(parent_rev, child_rev):
-            # First get the PHID of the parent revision
-            cmd = "echo " + quote_echo_string("""{"constraints": {"ids":[%s]}}""" % parent_rev)
-            cmd += " | %s call-conduit --conduit-uri=%s differential.revision.search --""" % (_arc(), self.url)
-
-            ret = self.run(cmd, shell=True)
-            try:
-                result = json.loads(ret.stdout.decode())
-            except Exception:
-                raise Exception("Could not decode response as JSON: %s" % ret.stdout.decode())
-
-            if result['error']:
-                raise Exception("Got an error from phabricator when trying to search for %s" % (parent_rev))
+        # Chain the revisions together (each one is the parent of the next) and associate
+        # them with the bug, making a single edit to each revision
+        parent_phids = self._get_revision_phids(phab_revisions[:-1])
 
-            assert 'response' in result
-            assert 'data' in result['response']
-            if len(result['response']['data']) != 1:
-                raise Exception("When querying conduit for diff %s, we got back %i results"
-                                % (parent_rev, len(result['response']['data'])))
-
-            parent_phid = result['response']['data'][0]['phid']
-
-            # Now connect them - add parent as parent of child
-            cmd = "echo " + quote_echo_string("""{"transactions": [{"type":"parents.add", "value":["%s"]}], "objectIdentifier": "%s"}""" % (parent_phid, child_rev))
-            cmd += " | %s call-conduit --conduit-uri=%s differential.revision.edit --""" % (_arc(), self.url)
-            ret = self.run(cmd, shell=True)
-            try:
-                result = json.loads(ret.stdout.decode())
-            except Exception:
-                raise Exception("Could not decode response as JSON: %s" % ret.stdout.decode())
-            if result['error']:
-                raise Exception("Got an error from phabricator when trying chain revisions, parent: %s, child %s %s" % (parent_rev, child_rev, parent_phid))
-
-        parent_rev = phab_revisions[0]
-        for child_rev in phab_revisions[1:]:
-            chain_revisions(parent_rev, child_rev)
-            parent_rev = child_rev
-
-        # Associate the patches with the bug
         @retry
-        def associate_bug_id(phab_revision):
-            cmd = "echo " + quote_echo_string("""{"transactions": [{"type":"bugzilla.bug-id", "value":"%s"}], "objectIdentifier": "%s"}""" % (bug_id, phab_revision))
-            cmd += " | %s call-conduit --conduit-uri=%s differential.revision.edit --""" % (_arc(), self.url)
-            ret = self.run(cmd, shell=True)
+        def edit_revision(phab_revision, transactions):
             try:
-                result = json.loads(ret.stdout.decode())
-            except Exception:
-                raise Exception("Could not decode response as JSON: %s" % ret.stdout.decode())
-            if result['error']:
-                raise Exception("Got an error from phabricator when trying to set the bugzilla id for %s" % (phab_revision))
+                self.conduit.edit_revision(phab_revision, transactions)
+            except ConduitError as e:
+                raise Exception("Got an error from phabricator when trying to set the bugzilla id (and parent) for %s" % (phab_revision)) from e
 
-        for p in phab_revisions:
-            associate_bug_id(p)
+        for i, p in enumerate(phab_revisions):
+            transactions = [{"type": "bugzilla.bug-id", "value": str(bug_id)}]
+            if i > 0:
+                transactions.append({"type": "parents.add", "value": [parent_phids[phab_revisions[i - 1]]]})
+            edit_revision(p, transactions)
 
         # Done
         for p in phab_revisions:
             self.logger.log("Submitted phabricator patch at {0}".format(self.url + p), level=LogLevel.Info)
         return phab_revisions
 
+    @retry
+    def _get_revision_phids(self, phab_revisions):
+        if not phab_revisions:
+            return {}
+        try:
+            results = self.conduit.search("differential.revision.search", {"ids": [int(r) for r in phab_revisions]})
+        except ConduitError as e:
+            raise Exception("Got an error from phabricator when trying to search for %s" % (phab_revisions)) from e
+
+        phids = {str(r['id']): r['phid'] for r in results}
+        for r in phab_revisions:
+            if str(r) not in phids:
+                raise Exception("When querying conduit for diffs %s, we did not get back %s" % (phab_revisions, r))
+        return phids
+
+    def _phid_cache_key(self, phab_username):
+        return self.url + "phid/" + phab_username
+
+    def _get_cached_phid(self, phab_username):
+        if phab_username not in self._phids and self.phid_cache:
+            phid = self.phid_cache.get(self._phid_cache_key(phab_username))
+            if phid:
+                self._phids[phab_username] = phid
+        return self._phids.get(phab_username, None)
+
+    def _remember_phid(self, phab_username, phid):
+        self._phids[phab_username] = phid
+        if self.phid_cache:
+            self.phid_cache.set(self._phid_cache_key(phab_username), phid)
+
+    # How many users or projects we ask about in one search (Conduit's page size)
+    PHID_SEARCH_CHUNK_SIZE = 100
+
+    @logEntryExit
+    def prefetch_reviewer_phids(self, phab_usernames):
+        """
+        Look up the PHIDs of all the given reviewers (typically every library's
+        maintainer_phab) we don't already know, with one search for the users and
+        one for the review groups, so set_reviewer doesn't have to. Any we can't
+        match up are left for set_reviewer to look up individually.
+        """
+        unknown = sorted(set(n for n in phab_usernames if n and not self._get_cached_phid(n)))
+        users = [n for n in unknown if n[0] != "#"]
+        projects = [n for n in unknown if n[0] == "#"]
+
+        for (method, constraint, field, names) in [("user.search", "usernames", "username", users),
+                                                   ("project.search", "slugs", "slug", projects)]:
+            for i in range(0, len(names), self.PHID_SEARCH_CHUNK_SIZE):
+                chunk = names[i:i + self.PHID_SEARCH_CHUNK_SIZE]
+                by_name = {n.lstrip("#").lower(): n for n in chunk}
+                for result in self.conduit.search(method, {constraint: chunk}):
+                    name = by_name.get(str(result.get('fields', {}).get(field, '')).lower(), None)
+                    if name:
+                        self._remember_phid(name, result['phid'])
+
+        self.logger.log("Resolved %s of %s unknown reviewers" % (len([n for n in unknown if n in self._phids]), len(unknown)), level=LogLevel.Info)
+
     @logEntryExit
     @retry
     def set_reviewer(self, phab_revision, phab_username):
-        # We have to call a different API endpoint if this is a review group
-        if phab_username[0] == "#":
-            # Get the group's phid (groups are implemented as 'projects'')
-            cmd = "echo " + quote_echo_string("""{"constraints": {"slugs":["%s"]}}""" % phab_username)
-            cmd += " | %s call-conduit --conduit-uri=%s project.search --""" % (_arc(), self.url)
-        else:
-            # Get the user's phid
-            cmd = "echo " + quote_echo_string("""{"constraints": {"usernames":["%s"]}}""" % phab_username)
-            cmd += " | %s call-conduit --conduit-uri=%s user.search --""" % (_arc(), self.url)
+        phid = self._get_cached_phid(phab_username)
+        if not phid:
+            phid = self._search_reviewer_phid(phab_username)
+            self._remember_phid(phab_username, phid)
 
-        ret = self.run(cmd, shell=True)
         try:
-            result = json.loads(ret.stdout.decode())
-        except Exception:
-            raise Exception("Could not decode response as JSON: %s" % ret.stdout.decode())
+            self.conduit.edit_revision(phab_revision, [{"type": "reviewers.set", "value": [phid]}])
+        except ConduitError as e:
+            raise Exception("Got an error from phabricator when trying to set reviewers to %s (%s) for %s: %s" % (phab_username, phid, phab_revision, e)) from e
 
-        if result['error']:
-            raise Exception("Got an error from phabricator when trying to search for %s" % (phab_username))
+    def _search_reviewer_phid(self, phab_username):
+        try:
+            # We have to call a different API endpoint if this is a review group
+            if phab_username[0] == "#":
+                # Get the group's phid (groups are implemented as 'projects'')
+                results = self.conduit.search("project.search", {"slugs": [phab_username]})
+            else:
+                # Get the user's phid
+                results = self.conduit.search("user.search", {"usernames": [phab_username]})
+        except ConduitError as e:
+            raise Exception("Got an error from phabricator when trying to search for %s" % (phab_username)) from e
 
-        assert 'response' in result
-        assert 'data' in result['response']
-        if len(result['response']['data']) != 1:
+        if len(results) != 1:
             raise Exception("When querying conduit for username %s, we got back %i results"
-                            % (phab_username, len(result['response']['data'])))
+                            % (phab_username, len(results)))
 
-        phid = result['response']['data'][0]['phid']
-
-        cmd = "echo " + quote_echo_string("""{"transactions": [{"type":"reviewers.set", "value":["%s"]}], "objectIdentifier": "%s"}""" % (phid, phab_revision))
-        cmd += " | %s call-conduit --conduit-uri=%s differential.revision.edit --""" % (_arc(), self.url)
-        ret = self.run(cmd, shell=True)
-        try:
-            result = json.loads(ret.stdout.decode())
-        except Exception:
-            raise Exception("Could not decode response as JSON: %s" % ret.stdout.decode())
-        if result['error']:
-            raise Exception("Got an error from phabricator when trying to set reviewers to %s (%s) for %s: %s" % (phab_username, phid, phab_revision, result))
+        return results[0]['phid']
 
     @logEntryExit
     @retry
     def abandon(self, phab_revision):
-        cmd = "echo " + quote_echo_string("""{"transactions": [{"type":"abandon", "value":true}],"objectIdentifier": "%s"}""" % phab_revision)
-        cmd += " | %s call-conduit --conduit-uri=%s differential.revision.edit --""" % (_arc(), self.url)
-        ret = self.run(cmd, shell=True)
         try:
-            result = json.loads(ret.stdout.decode())
-        except Exception:
-            raise Exception("Could not decode response as JSON: %s" % ret.stdout.decode())
-        if result['error']:
-            if "You can not abandon this revision because it has already been closed." in result['errorMessage']:
+            self.conduit.edit_revision(phab_revision, [{"type": "abandon", "value": True}])
+        except ConduitError as e:
+            if "You can not abandon this revision because it has already been closed." in str(e.error_info):
                 self.logger.log("Strangely, the phabricator revision %s was already closed when we tried to abandon it. Oh well." % phab_revision, level=LogLevel.Warning)
             else:
-                raise Exception("Got an error from phabricator when trying to abandon %s: %s" % (phab_revision, result))
+                raise Exception("Got an error from phabricator when trying to abandon %s: %s" % (phab_revision, e)) from e
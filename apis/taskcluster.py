@@ -5,19 +5,26 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 from enum import unique, IntEnum
+import math
+import functools
 import jsone
 import platform
-import requests
 from collections import defaultdict
-from urllib.parse import quote_plus
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote_plus, urlparse, urlencode, parse_qs
 
-from components.utilities import retry, Struct, merge_dictionaries, PUSH_HEALTH_IGNORED_DICTS, PUSH_HEALTH_IGNORED_KEYS
+from components.utilities import retry, pooled_session
 from components.logging import logEntryExit, logEntryExitNoArgs, LogLevel
 from components.providerbase import BaseProvider, INeedsCommandProvider, INeedsLoggingProvider
+from components.timing import timings
+from components.diskcache import DiskCache
 
 # We want to run tests a total of four times
 TRIGGER_TOTAL = 4
 
+# New failure classifications are added to Treeherder very rarely
+FAILURE_CLASSIFICATIONS_TTL = 24 * 60 * 60
+
 
 # These are intentionally ordered so that the ones that override the others have a higher value
 @unique
@@ -55,6 +62,35 @@ class Classification(IntEnum):
         return Classification.Unassigned
 
 
+class Job:
+    """
+    One row of a Treeherder job list. Pushes can have thousands of jobs with
+    dozens of columns each, of which we only read a handful, so rather than
+    building a dict per job we keep the row as Treeherder sent it. Each list of
+    column names gets its own subclass (see with_columns) whose properties read
+    the columns out of the row by position.
+    """
+    __slots__ = ('_row', 'decision_task')
+    _columns = ()
+
+    def __init__(self, row, decision_task=None):
+        self._row = row
+        self.decision_task = decision_task
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def with_columns(columns):
+        namespace = {'__slots__': (), '_columns': columns}
+        for i, name in enumerate(columns):
+            if name in Job.__slots__:
+                raise Exception("Treeherder returned a job column '%s' that clashes with one of our attributes" % name)
+            namespace[name] = property(lambda self, i=i: self._row[i])
+        return type("Job", (Job,), namespace)
+
+    def __repr__(self):
+        return "Job(%s)" % ", ".join("%s=%r" % (c, v) for c, v in zip(self._columns, self._row))
+
+
 class Task:
     def __init__(self, task, classification):
         self.task_id = task.task_id
@@ -83,28 +119,52 @@ class ResultGroup:
     Result group is a group of tasks that all share a commonality - they either ran the same test, or they ran the same job
     It will contain both the failed and the successful jobs for that group.
     We will upgrade the classification of the entire group after every new task we see.
+
+    The failed tasks and the job names are indexed as tasks are added, so that
+    asking about them doesn't require going through every task again.
     """
 
     def __init__(self, name):
         self.name = name
         self.tasks = {}
+        self._failed = {}
+        self.job_type_names = set()
         self.classification = Classification.PossibleIntermittent
 
     def all(self):
         return self.tasks.values()
 
     def failed(self):
-        return [t for t in self.tasks.values() if t.failed]
+        return list(self._failed.values())
+
+    @property
+    def total_count(self):
+        return len(self.tasks)
+
+    @property
+    def failed_count(self):
+        return len(self._failed)
+
+    def failed_task_ids(self):
+        return self._failed.keys()
 
     def task_ids(self):
-        return [t.task_id for t in self.tasks]
+        return list(self.tasks.keys())
+
+    def _set_task(self, t):
+        self.tasks[t.task_id] = t
+        self.job_type_names.add(t.job_type_name)
+        if t.failed:
+            self._failed[t.task_id] = t
+        else:
+            self._failed.pop(t.task_id, None)
 
     def add_task(self, task, classification):
         t = Task(task, classification)
 
         self.classification = max(self.classification, classification)
         if t.task_id not in self.tasks:
-            self.tasks[t.task_id] = t
+            self._set_task(t)
 
     # This gets used from the Push Health results, and Push Health might have
     # its own classification information that would override things
@@ -112,7 +172,7 @@ class ResultGroup:
         for t in tasks:
             assert(isinstance(t, Task))
             self.classification = max(self.classification, classification, t.classification)
-            self.tasks[t.task_id] = t
+            self._set_task(t)
 
     def __repr__(self):
         return "%s:(%s)" % (self.classification.mini(), ", ".join(["%s:%s:%s" % (t.task_id, "F" if t.failed else "P", t.classification.mini()) for t in self.tasks.values()]))
@@ -139,6 +199,24 @@ class TaskclusterProvider(BaseProvider, INeedsCommandProvider, INeedsLoggingProv
             'User-Agent': 'Updatebot'
         }
 
+        # How many requests (e.g. pages of a job list) we will make to Treeherder at once.
+        # The fan-out is nested: _run_concurrently can make that many get_job_details
+        # calls at once, each fetching that many pages at once, so the session keeps
+        # enough connections for all of them.
+        self.max_concurrent_requests = int(config.get('max_concurrent_requests', 4))
+        self.session = pooled_session(self.max_concurrent_requests * self.max_concurrent_requests, self.HEADERS)
+        self._actions_cache = {}
+
+        # If configured, we keep the Treeherder and Taskcluster responses that can't change
+        # (a push's id, actions.json) on disk between runs. Responses that may still change
+        # are kept for artifact_cache_ttl seconds. That includes every push's job list: even
+        # once all its jobs have completed, it gains jobs when anyone retriggers some.
+        self.artifact_cache = None
+        if config.get('artifact_cache_path', None):
+            max_size = int(config.get('artifact_cache_max_size_mb', 1024)) * 1024 * 1024
+            self.artifact_cache = DiskCache(config['artifact_cache_path'], max_size)
+        self.artifact_cache_ttl = int(config.get('artifact_cache_ttl', 10 * 60))
+
     # =================================================================
     # =================================================================
     @logEntryExit
@@ -194,15 +272,12 @@ class TaskclusterProvider(BaseProvider, INeedsCommandProvider, INeedsLoggingProv
 
     @staticmethod
     def _transform_job_list(property_names, job_list):
+        job_class = Job.with_columns(tuple(property_names))
         decision_task = None
         new_job_list = []
         # We will need to reference the decision task, so we find populate that here also.
         for j in job_list:
-            d = {}
-            for i in range(len(property_names)):
-                d[property_names[i]] = j[i]
-
-            job_obj = Struct(**d, decision_task=None)
+            job_obj = job_class(j)
             new_job_list.append(job_obj)
 
             if "Gecko Decision Task" == job_obj.job_type_name:
@@ -215,14 +290,31 @@ class TaskclusterProvider(BaseProvider, INeedsCommandProvider, INeedsLoggingProv
 
     # =================================================================
 
+    def _cache_get(self, key):
+        return self.artifact_cache.get(key) if self.artifact_cache else None
+
+    def _cache_set(self, key, value, ttl=None):
+        if self.artifact_cache:
+            self.artifact_cache.set(key, value, ttl)
+
+    def _cache_delete(self, key):
+        if self.artifact_cache:
+            self.artifact_cache.delete(key)
+
+    # =================================================================
+
     def _get_failure_classifications(self):
         if not self._failure_classifications:
-            self.logger.log("Requesting failure classifications", level=LogLevel.Info)
-            r = requests.get(self.url_treeherder + "api/failureclassification/", headers=self.HEADERS)
-            try:
-                j = r.json()
-            except Exception:
-                raise Exception("Could not parse the result of the failureclassification request as json. Response:\n%s" % (r.text))
+            url = self.url_treeherder + "api/failureclassification/"
+            j = self._cache_get(url)
+            if j is None:
+                self.logger.log("Requesting failure classifications", level=LogLevel.Info)
+                r = self.session.get(url)
+                try:
+                    j = r.json()
+                except Exception:
+                    raise Exception("Could not parse the result of the failureclassification request as json. Response:\n%s" % (r.text))
+                self._cache_set(url, j, FAILURE_CLASSIFICATIONS_TTL)
 
             failureclassifications = {}
             for f in j:
@@ -256,13 +348,20 @@ class TaskclusterProvider(BaseProvider, INeedsCommandProvider, INeedsLoggingProv
         # First ignore all the retry jobs for everything.
         all_jobs = [j for j in all_jobs if j.result != "retry"]
 
+        # There are only a handful of failure classifications, so map each one once
+        classifications = {}
+
         tasks_by_jobname = {}
         for j in all_jobs:
-            if j.job_type_name not in tasks_by_jobname:
-                tasks_by_jobname[j.job_type_name] = ResultGroup(j.job_type_name)
-            group = tasks_by_jobname[j.job_type_name]
+            job_type_name = j.job_type_name
+            if job_type_name not in tasks_by_jobname:
+                tasks_by_jobname[job_type_name] = ResultGroup(job_type_name)
+            group = tasks_by_jobname[job_type_name]
 
-            group.add_task(j, Classification.from_string(self.failure_classifications[j.failure_classification_id], self.logger))
+            failure_classification_id = j.failure_classification_id
+            if failure_classification_id not in classifications:
+                classifications[failure_classification_id] = Classification.from_string(self.failure_classifications[failure_classification_id], self.logger)
+            group.add_task(j, classifications[failure_classification_id])
 
         tasks_by_testname = {}
         for t in push_health['metrics']['tests']['details']['needInvestigation'] + push_health['metrics']['tests']['details']['knownIssues']:
@@ -278,7 +377,7 @@ class TaskclusterProvider(BaseProvider, INeedsCommandProvider, INeedsLoggingProv
         for testname in tasks_by_testname:
             group = tasks_by_testname[testname]
 
-            if group.classification != Classification.NotYourFault and len(group.failed()) > 0 and len(group.all()) <= 2:
+            if group.classification != Classification.NotYourFault and group.failed_count > 0 and group.total_count <= 2:
                 tasks_to_retrigger.update(group.failed())
             else:
                 tasks_not_to_retrigger.update(group.failed())
@@ -293,15 +392,15 @@ class TaskclusterProvider(BaseProvider, INeedsCommandProvider, INeedsLoggingProv
             if group.classification == Classification.NotYourFault:
                 continue
 
-            if len(group.failed()) > 0 and len(group.all()) <= 2:
+            if group.failed_count > 0 and group.total_count <= 2:
                 for t in group.failed():
                     # Do not retrigger jobs unless they were not seen in push health
                     if t not in tasks_not_to_retrigger:
                         tasks_to_retrigger.add(t)
 
-        self.logger.log("tasks_by_jobname: %s" % tasks_by_jobname, level=LogLevel.Debug)
-        self.logger.log("tasks_by_testname: %s" % tasks_by_testname, level=LogLevel.Debug)
-        self.logger.log("tasks_to_retrigger: %s" % tasks_to_retrigger, level=LogLevel.Debug)
+        self.logger.log("tasks_by_jobname:", tasks_by_jobname, level=LogLevel.Debug)
+        self.logger.log("tasks_by_testname:", tasks_by_testname, level=LogLevel.Debug)
+        self.logger.log("tasks_to_retrigger:", tasks_to_retrigger, level=LogLevel.Debug)
 
         # Return the list of jobs to retrigger, as well as information about the test failures
         #    and job mappings
@@ -310,8 +409,21 @@ class TaskclusterProvider(BaseProvider, INeedsCommandProvider, INeedsLoggingProv
 
             'tasks_by_jobname': tasks_by_jobname,
             'tasks_by_testname': tasks_by_testname,
+
+            # The groups with failures, by their (final) classification, in the
+            # same order as above.
+            'failed_tests_by_classification': TaskclusterProvider._failed_groups_by_classification(tasks_by_testname),
+            'failed_jobs_by_classification': TaskclusterProvider._failed_groups_by_classification(tasks_by_jobname),
         }
 
+    @staticmethod
+    def _failed_groups_by_classification(groups):
+        by_classification = defaultdict(list)
+        for name, group in groups.items():
+            if group.failed_count:
+                by_classification[group.classification].append((name, group))
+        return by_classification
+
     # =================================================================
     # =================================================================
 
@@ -324,10 +436,54 @@ class TaskclusterProvider(BaseProvider, INeedsCommandProvider, INeedsLoggingProv
     @logEntryExit
     @retry
     def get_job_details(self, revision):
+        push_id = self._get_push_id(revision)
+
+        job_details_url = self._get_job_details_url(push_id)
+        cached = self._cache_get(job_details_url)
+        if cached is not None:
+            self.logger.log("Using the cached job list for push id %s" % push_id, level=LogLevel.Info)
+            return TaskclusterProvider._transform_job_list(cached['job_property_names'], cached['results'])
+
+        try:
+            # We get the first page to learn how many jobs (and hence pages) there are, then
+            # request all the other pages at once.  Finally, if the push gained jobs while we
+            # were doing that, we follow 'next' from the last page until we have everything.
+            pages = [self._get_job_details_page(push_id, job_details_url)]
+            pages += self._get_job_details_pages_concurrently(push_id, pages[0])
+
+            job_details_url = pages[-1].get('next', None)
+            while job_details_url:
+                pages.append(self._get_job_details_page(push_id, job_details_url))
+                job_details_url = pages[-1].get('next', None)
+
+            property_names = pages[0]['job_property_names']
+            job_list = []
+            for page in pages:
+                if page['job_property_names'] != property_names:
+                    raise Exception("The first j['job_property_names'] was %s, but a subsequant one was %s" % (property_names, page['job_property_names']))
+                job_list.extend(page['results'])
+        except Exception as e:
+            raise Exception("Could not obtain all the job results for push id %s" % push_id) from e
+
+        # Even a completed push gains jobs if they are retriggered, by us (in which case we
+        # remove it from the cache) or by someone else (in which case we can't know), so
+        # the job list is only kept for a while.
+        self._cache_set(self._get_job_details_url(push_id),
+                        {'job_property_names': property_names, 'results': job_list},
+                        self.artifact_cache_ttl)
+
+        new_job_list = TaskclusterProvider._transform_job_list(property_names, job_list)
+
+        return new_job_list
+
+    def _get_push_id(self, revision):
         push_list_url = self._get_push_list_url(revision)
-        self.logger.log("Requesting revision %s from %s" % (revision, push_list_url), level=LogLevel.Info)
+        push_id = self._cache_get(push_list_url)
+        if push_id is not None:
+            return push_id
 
-        r = requests.get(push_list_url, headers=self.HEADERS)
+        self.logger.log("Requesting revision %s from %s" % (revision, push_list_url), level=LogLevel.Info)
+        r = self.session.get(push_list_url)
         try:
             push_list = r.json()
         except Exception:
@@ -338,35 +494,73 @@ class TaskclusterProvider(BaseProvider, INeedsCommandProvider, INeedsLoggingProv
         except Exception as e:
             raise Exception("Could not find the expected ['results'][0]['id'] from %s" % r.text) from e
 
-        job_list = []
-        property_names = []
-        job_details_url = self._get_job_details_url(push_id)
+        self._cache_set(push_list_url, push_id)
+        return push_id
+
+    def _get_job_details_page(self, push_id, job_details_url):
+        self.logger.log("Requesting push id %s from %s" % (push_id, job_details_url), level=LogLevel.Info)
+        r = self.session.get(job_details_url)
         try:
-            while job_details_url:
-                self.logger.log("Requesting push id %s from %s" % (push_id, job_details_url), level=LogLevel.Info)
-                r = requests.get(job_details_url, headers=self.HEADERS)
-                try:
-                    j = r.json()
-                except Exception:
-                    raise Exception("Could not parse the result of the jobs list as json. Url: %s Response:\n%s" % (job_details_url, r.text))
-
-                job_list.extend(j['results'])
-                if not property_names:
-                    property_names = j['job_property_names']
-                else:
-                    for i in range(len(property_names)):
-                        if len(property_names) != len(j['job_property_names']):
-                            raise Exception("The first j['job_property_names'] was %i elements long, but a subsequant one was %i for url %s" % (len(property_names), len(j['job_property_names']), job_details_url))
-                        elif property_names[i] != j['job_property_names'][i]:
-                            raise Exception("Property name %s (index %i) doesn't match %s" % (property_names[i], i, j['job_property_names'][i]))
-
-                job_details_url = j['next'] if 'next' in j else None
-        except Exception as e:
-            raise Exception("Could not obtain all the job results for push id %s" % push_id) from e
+            return r.json()
+        except Exception:
+            raise Exception("Could not parse the result of the jobs list as json. Url: %s Response:\n%s" % (job_details_url, r.text))
 
-        new_job_list = TaskclusterProvider._transform_job_list(property_names, job_list)
+    def _get_job_details_pages_concurrently(self, push_id, first_page):
+        """
+        Given the first page of a job list, returns the remaining pages (in order) by
+        requesting them concurrently. If we can't tell how to address the other pages,
+        returns nothing, and the caller will follow the 'next' links instead.
+        """
+        if not first_page.get('next', None) or 'count' not in first_page or not first_page['results']:
+            return []
+
+        next_url = urlparse(first_page['next'])
+        query = parse_qs(next_url.query)
+        if 'page' not in query or query['page'] != ['2']:
+            return []
+
+        num_pages = math.ceil(first_page['count'] / len(first_page['results']))
+        urls = []
+        for page in range(2, num_pages + 1):
+            query['page'] = [str(page)]
+            urls.append(next_url._replace(query=urlencode(query, doseq=True)).geturl())
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_requests) as executor:
+            # map() returns the results in the order of urls
+            pages = list(executor.map(lambda url: self._get_job_details_page(push_id, url), urls))
+
+        # The pages we computed replaced the 'next' chain of all but the last page
+        for page in pages[:-1]:
+            page['next'] = None
+        return pages
+
+    def _run_concurrently(self, calls):
+        """
+        Make each of calls, a list of (func, *args), on up to max_concurrent_requests
+        threads (which share our pooled session) and return their results in order.
+        """
+        library = timings.library
 
-        return new_job_list
+        def call(c):
+            # Time spent on a worker thread still belongs to the library we're processing
+            timings.set_library(library)
+            try:
+                return c[0](*c[1:])
+            finally:
+                timings.clear_library()
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_requests) as executor:
+            return list(executor.map(call, calls))
+
+    @logEntryExitNoArgs
+    def get_job_details_and_push_health(self, revisions):
+        """
+        Fetch the job list and the push health of every revision at once. Returns a
+        list of (job_list, push_health) in the order of revisions.
+        """
+        results = self._run_concurrently(
+            [(self.get_job_details, r) for r in revisions] + [(self.get_push_health, r) for r in revisions])
+        return list(zip(results[:len(revisions)], results[len(revisions):]))
 
     @logEntryExitNoArgs
     def combine_job_lists(self, job_list_1, job_list_2):
@@ -384,7 +578,7 @@ class TaskclusterProvider(BaseProvider, INeedsCommandProvider, INeedsLoggingProv
         push_health_url = self._get_push_health_url(revision)
         self.logger.log("Requesting push health for revision %s from %s" % (revision, push_health_url), level=LogLevel.Info)
 
-        r = requests.get(push_health_url, headers=self.HEADERS)
+        r = self.session.get(push_health_url)
         try:
             push_health = r.json()
         except Exception:
@@ -392,12 +586,29 @@ class TaskclusterProvider(BaseProvider, INeedsCommandProvider, INeedsLoggingProv
 
         return push_health
 
+    # The sections of push health that determine_jobs_to_retrigger uses
+    PUSH_HEALTH_DETAILS = ['needInvestigation', 'knownIssues']
+
     @logEntryExitNoArgs
     def combine_push_healths(self, push_health_1, push_health_2):
-        combined = merge_dictionaries(push_health_1, push_health_2,
-                                      ignored_dicts=PUSH_HEALTH_IGNORED_DICTS,
-                                      ignored_keys=PUSH_HEALTH_IGNORED_KEYS)
-        return combined
+        """
+        Fold push_health_2 into push_health_1, which is either the result of a
+        previous call or {} to start. Only the test failure lists that
+        determine_jobs_to_retrigger looks at are kept; they are added to in place
+        rather than copying the whole (large) document for every try run.
+
+        push_health_2's failures go before the ones already combined, as they did
+        when we merged the whole documents; the order of the lines in our bug
+        comments follows it.
+        """
+        if not push_health_1:
+            push_health_1 = {'metrics': {'tests': {'details': {k: [] for k in self.PUSH_HEALTH_DETAILS}}}}
+
+        combined = push_health_1['metrics']['tests']['details']
+        details = push_health_2.get('metrics', {}).get('tests', {}).get('details', {})
+        for k in self.PUSH_HEALTH_DETAILS:
+            combined[k][0:0] = details.get(k, [])
+        return push_health_1
 
     # =================================================================
     # =================================================================
@@ -409,52 +620,62 @@ class TaskclusterProvider(BaseProvider, INeedsCommandProvider, INeedsLoggingProv
             assert j.decision_task is not None
             decision_task_groups[j.decision_task].append(j)
 
-        retrigger_decision_task_ids = []
-        # Go through each group:
-        for decision_task in decision_task_groups:
-            self.logger.log("Processing decision task %s" % decision_task.task_id, level=LogLevel.Info)
-            to_retrigger = decision_task_groups[decision_task]
+        # Then retrigger each group at once; the ids are returned in the order of the groups
+        return self._run_concurrently(
+            [(self._retrigger_decision_task_group, decision_task, jobs) for decision_task, jobs in decision_task_groups.items()])
+
+    def _get_actions(self, decision_task_id):
+        # A decision task's actions.json never changes, so we only download it once
+        if decision_task_id not in self._actions_cache:
+            artifact_url = self.url_taskcluster + "api/queue/v1/task/%s/runs/0/artifacts/public/actions.json" % (decision_task_id)
+            actions = self._cache_get(artifact_url)
+            if actions is None:
+                r = self.session.get(artifact_url)
+                try:
+                    actions = r.json()
+                except Exception:
+                    raise Exception("Could not parse the result of the actions.json artifact as json. Url: %s Response:\n%s" % (artifact_url, r.text))
+                self._cache_set(artifact_url, actions)
+            self._actions_cache[decision_task_id] = actions
+        return self._actions_cache[decision_task_id]
 
-            # Download its actions.json
-            artifact_url = self.url_taskcluster + "api/queue/v1/task/%s/runs/0/artifacts/public/actions.json" % (decision_task.task_id)
-            r = requests.get(artifact_url, headers=self.HEADERS)
-            try:
-                actions = r.json()
-            except Exception:
-                raise Exception("Could not parse the result of the actions.json artifact as json. Url: %s Response:\n%s" % (artifact_url, r.text))
-
-            # Find the retrigger action
-            retrigger_action = None
-            for a in actions['actions']:
-                if "retrigger-multiple" == a['name']:
-                    retrigger_action = a
-                    break
-            assert retrigger_action is not None
-
-            # Fill in the taskId of the jobs I want to retrigger using JSON-E
-            retrigger_tasks = [i.job_type_name for i in to_retrigger]
-            context = {
-                'taskGroupId': retrigger_action['hookPayload']['decision']['action']['taskGroupId'],
-                'taskId': None,
-                'input': {'requests': [{'tasks': retrigger_tasks, 'times': TRIGGER_TOTAL - 1}]}
-            }
-            template = retrigger_action['hookPayload']
-
-            payload = jsone.render(template, context)
-
-            trigger_url = self.url_taskcluster + "api/hooks/v1/hooks/%s/%s/trigger" % \
-                (quote_plus(retrigger_action["hookGroupId"]), quote_plus(retrigger_action["hookId"]))
-
-            self.logger.log("Issuing a retrigger to %s" % (trigger_url), level=LogLevel.Info)
-            r = requests.post(trigger_url, json=payload)
-            try:
-                if r.status_code == 200:
-                    output = r.json()
-                    retrigger_decision_task_ids.append(output["status"]["taskId"])
-                    self.logger.log("Succeeded, the response taskid is %s" % output["status"]["taskId"], level=LogLevel.Info)
-                else:
-                    raise Exception("Task retrigger did not complete successfully, status code is " + str(r.status_code) + "\n\n" + r.text)
-            except Exception as e:
-                raise Exception("Task retrigger did not complete successfully (exception raised during json parsing), response is\n" + r.text) from e
-
-        return retrigger_decision_task_ids
+    def _retrigger_decision_task_group(self, decision_task, to_retrigger):
+        self.logger.log("Processing decision task %s" % decision_task.task_id, level=LogLevel.Info)
+
+        actions = self._get_actions(decision_task.task_id)
+
+        # Find the retrigger action
+        retrigger_action = None
+        for a in actions['actions']:
+            if "retrigger-multiple" == a['name']:
+                retrigger_action = a
+                break
+        assert retrigger_action is not None
+
+        # Fill in the taskId of the jobs I want to retrigger using JSON-E
+        retrigger_tasks = [i.job_type_name for i in to_retrigger]
+        context = {
+            'taskGroupId': retrigger_action['hookPayload']['decision']['action']['taskGroupId'],
+            'taskId': None,
+            'input': {'requests': [{'tasks': retrigger_tasks, 'times': TRIGGER_TOTAL - 1}]}
+        }
+        template = retrigger_action['hookPayload']
+
+        payload = jsone.render(template, context)
+
+        trigger_url = self.url_taskcluster + "api/hooks/v1/hooks/%s/%s/trigger" % \
+            (quote_plus(retrigger_action["hookGroupId"]), quote_plus(retrigger_action["hookId"]))
+
+        self.logger.log("Issuing a retrigger to %s" % (trigger_url), level=LogLevel.Info)
+        r = self.session.post(trigger_url, json=payload)
+        try:
+            if r.status_code == 200:
+                output = r.json()
+                # The push is going to gain the retriggered jobs
+                self._cache_delete(self._get_job_details_url(decision_task.push_id))
+                self.logger.log("Succeeded, the response taskid is %s" % output["status"]["taskId"], level=LogLevel.Info)
+                return output["status"]["taskId"]
+            else:
+                raise Exception("Task retrigger did not complete successfully, status code is " + str(r.status_code) + "\n\n" + r.text)
+        except Exception as e:
+            raise Exception("Task retrigger did not complete successfully (exception raised during json parsing), response is\n" + r.text) from e
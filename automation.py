@@ -8,7 +8,10 @@ import os
 import re
 import sys
 import time
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from components.logging import LoggingProvider, SimpleLogger, LogLevel
+from components.timing import timings
 from components.commandprovider import CommandProvider
 from components.dbc import DatabaseProvider
 from components.libraryprovider import LibraryProvider
@@ -199,6 +202,7 @@ class Updatebot:
     def run(self, library_filter=""):
         try:
             start_time = time.time()
+            timings.reset()
             updatebot_version = self.cmdProvider.run(["git", "log", "-1", "--oneline"], shell=False, clean_return=True).stdout.decode().strip()
             python_version = sys.version.replace("\n", " ")
             self.logger.log("Running Updatebot version: {0} on Python {1}".format(updatebot_version, python_version), level=LogLevel.Info)
@@ -218,25 +222,40 @@ class Updatebot:
             if 'separate-platforms' not in self.config_dictionary['General']:
                 self.config_dictionary['General']['separate-platforms'] = False
 
-            libraries = self.libraryProvider.get_libraries(self.config_dictionary['General']['gecko-path'])
-            for lib in libraries:
+            libraries = []
+            with timings.span("run", "get_libraries"):
+                all_libraries = self.libraryProvider.get_libraries(self.config_dictionary['General']['gecko-path'])
+            for lib in all_libraries:
                 if library_filter and library_filter not in lib.name:
                     self.logger.log("Skipping %s because it doesn't meet the filter '%s'" % (lib.name, library_filter), level=LogLevel.Info)
                     continue
+                libraries.append(lib)
+
+            with timings.span("run", "prefetch_open_bugs"):
+                self._prefetch_open_bugs(libraries)
+            with timings.span("run", "prefetch_reviewer_phids"):
+                self._prefetch_reviewer_phids(libraries)
+            with timings.span("run", "prefetch"):
+                self._prefetch(libraries)
 
+            for lib in libraries:
                 for task in lib.tasks:
                     self.logger.set_context(lib.name)
+                    timings.set_library(lib.name)
                     try:
                         taskRunner = self.taskRunners[task.type]
 
-                        self.runOnProviders(lambda x: x.initialize())
-                        taskRunner.process_task(lib, task)
-                        self.runOnProviders(lambda x: x.reset())
+                        with timings.span("run", task.type):
+                            self.runOnProviders(lambda x: x.initialize())
+                            taskRunner.process_task(lib, task)
+                            self.runOnProviders(lambda x: x.reset())
                     except Exception as e:
                         # Clean up any changes to the repo we may have made
                         reset_repository(self.cmdProvider)
                         self.logger.log("Caught an exception while processing library %s task type %s" % (lib.name, task.type), level=LogLevel.Error)
                         self.logger.log_exception(e)
+                    finally:
+                        timings.clear_library()
 
                     if "soft_timeout" in self.config_dictionary["General"]:
                         soft_timeout = self.config_dictionary["General"]["soft_timeout"]
@@ -249,6 +268,93 @@ class Updatebot:
         except Exception as e:
             self.logger.log_exception(e)
             raise(e)
+        finally:
+            self._report_timings()
+
+    def _report_timings(self):
+        """
+        Log a JSON summary of where this run spent its time and, if
+        ['General']['timing-summary-path'] is set, also write it to that file.
+        """
+        summary = timings.summary()
+        self.logger.log("Timing summary: %s" % json.dumps(summary, sort_keys=True), level=LogLevel.Info)
+
+        path = self.config_dictionary['General'].get('timing-summary-path', None)
+        if path:
+            try:
+                with open(path, "w") as f:
+                    json.dump(summary, f, indent=2, sort_keys=True)
+            except Exception as e:
+                self.logger.log("Could not write the timing summary to %s: %s" % (path, e), level=LogLevel.Warning)
+
+    def _prefetch_open_bugs(self, libraries):
+        """
+        Every task starts by asking Bugzilla which of its library's bugs are still
+        open. Rather than one request per task, we gather the bugs of every job we
+        are going to look at and ask about them all at once.
+
+        Like _prefetch, a failure here is not fatal; the tasks will ask for the
+        bugs themselves.
+        """
+        try:
+            bug_ids = self.dbProvider.get_bug_ids_for_libraries(
+                [(lib, self.taskRunners[task.type].jobType) for lib in libraries for task in lib.tasks])
+            self.bugzillaProvider.prefetch_open_bugs(bug_ids)
+        except Exception as e:
+            self.logger.log("Caught an exception while prefetching open bugs, they will be looked up by each task: %s" % e, level=LogLevel.Warning)
+
+    def _prefetch_reviewer_phids(self, libraries):
+        """
+        Vendoring tasks set the library's maintainer as the reviewer of the patches
+        they submit; look all of them up in Phabricator at once. Like the other
+        prefetches, a failure is not fatal.
+        """
+        try:
+            self.phabricatorProvider.prefetch_reviewer_phids(
+                [lib.maintainer_phab for lib in libraries if any(task.type == 'vendoring' for task in lib.tasks)])
+        except Exception as e:
+            self.logger.log("Caught an exception while looking up the reviewers' PHIDs, they will be looked up when needed: %s" % e, level=LogLevel.Warning)
+
+    def _prefetch(self, libraries):
+        """
+        Most of the wall-clock time of a run is spent waiting on the network or on
+        subprocesses (./mach vendor --check-for-update, git, Bugzilla). Those parts of
+        a task do not touch the gecko working copy, so we let every TaskRunner do them
+        for all the libraries up front, concurrently. Anything that modifies the working
+        copy (vendoring, committing, pushing to try) still happens in the serial loop
+        in run().
+
+        The number of workers is controlled by ['General']['parallel-workers']; with the
+        default of 1 we skip this step entirely and everything happens serially.
+
+        A prefetch failure is not fatal: the TaskRunner will redo the work (and surface
+        the error) when the task is processed.
+        """
+        workers = int(self.config_dictionary['General'].get('parallel-workers', 1))
+        if workers <= 1:
+            return
+
+        jobs = [(lib, task) for lib in libraries for task in lib.tasks]
+        self.logger.log("Prefetching %s tasks using %s workers" % (len(jobs), workers), level=LogLevel.Info)
+        start_time = time.time()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self._prefetch_task, lib, task): (lib, task) for (lib, task) in jobs}
+            for f in as_completed(futures):
+                lib, task = futures[f]
+                try:
+                    f.result()
+                except Exception as e:
+                    self.logger.log("Caught an exception while prefetching library %s task type %s, it will be retried serially: %s" % (lib.name, task.type, e), level=LogLevel.Warning)
+
+        self.logger.log("Prefetching finished in %.2f seconds" % (time.time() - start_time), level=LogLevel.Info)
+
+    def _prefetch_task(self, lib, task):
+        timings.set_library(lib.name)
+        try:
+            self.taskRunners[task.type].prefetch(lib, task)
+        finally:
+            timings.clear_library()
 
 
 # ====================================================================
@@ -3,7 +3,13 @@
 # This Source Code Form is subject to the terms of the Mozilla Public
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
-from apis.bugzilla_api import fileBug, commentOnBug, closeBug, openBugsMetadata, markFFVersionAffected, getBugComments
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from dateutil.parser import parse
+
+from apis.bugzilla_api import BugzillaClient, fileBug, commentOnBug, closeBug, openBugsMetadata, chunkBugIDs, markFFVersionAffected, markFFVersionsAffected, getBugComments
+from components.diskcache import DiskCache
 from components.providerbase import BaseProvider, INeedsLoggingProvider
 from components.logging import LogLevel, logEntryExit
 
@@ -198,6 +204,25 @@ class BugzillaProvider(BaseProvider, INeedsLoggingProvider):
             else:
                 assert ('url' in self.config) or (self.config['General']['env'] in ["dev", "prod"]), "No bugzilla url provided, and unknown operating environment"
 
+        self.pool_size = self.config.get('http_pool_size', 10)
+        self.client = BugzillaClient(self.config['url'], self.config['apikey'],
+                                     pool_size=self.pool_size,
+                                     timeout=self.config.get('http_timeout', 60))
+
+        # The open bugs (and their metadata) out of every bug id we've asked about this
+        # run. Bugs we change ourselves are forgotten, so they'll be asked about again.
+        self._checked_bug_ids = set()
+        self._open_bugs = {}
+
+        # How far we have read through each bug's comments looking for a landing link,
+        # so we only need to fetch the comments made since. If configured, this is also
+        # kept on disk between runs.
+        self._comment_scans = {}
+        self.comment_cache = None
+        if self.config.get('comment_cache_path', None):
+            max_size = int(self.config.get('comment_cache_max_size_mb', 64)) * 1024 * 1024
+            self.comment_cache = DiskCache(self.config['comment_cache_path'], max_size)
+
     @logEntryExit
     def file_bug(self, library, summary, description, cc_list, needinfo=None, see_also=None, depends_on=None, blocks=None, moco_confidential=False):
         if len(description) > 65535:
@@ -206,7 +231,7 @@ class BugzillaProvider(BaseProvider, INeedsLoggingProvider):
             description = description[0:65533 - len(suffix)] + suffix
 
         try:
-            bugID = fileBug(self.config['url'], self.config['apikey'], self.config['General']['ff-version'],
+            bugID = fileBug(self.client, self.config['General']['ff-version'],
                             library.bugzilla_product, library.bugzilla_component,
                             summary, description, cc_list, needinfo, see_also, depends_on, blocks, moco_confidential)
         except Exception as e:
@@ -228,7 +253,7 @@ class BugzillaProvider(BaseProvider, INeedsLoggingProvider):
 
         try:
             commentOnBug(
-                self.config['url'], self.config['apikey'], bug_id, comment, needinfo=needinfo, assignee=assignee)
+                self.client, bug_id, comment, needinfo=needinfo, assignee=assignee)
         except Exception as e:
             if is_needinfo_exception(e):
                 self.logger.log("Developer is not accepting needinfos, trying again without...", level=LogLevel.Info)
@@ -236,28 +261,103 @@ class BugzillaProvider(BaseProvider, INeedsLoggingProvider):
             else:
                 raise e
 
+        if assignee:
+            self._forget_bug(bug_id)
         self.logger.log("Filed Comment on Bug %s" % (bug_id), level=LogLevel.Info)
 
     @logEntryExit
     def wontfix_bug(self, bug_id, comment):
-        closeBug(self.config['url'], self.config['apikey'], bug_id, 'WONTFIX', comment)
+        self._forget_bug(bug_id)
+        closeBug(self.client, bug_id, 'WONTFIX', comment)
 
     @logEntryExit
     def dupe_bug(self, bug_id, comment, dup_id):
-        closeBug(self.config['url'], self.config['apikey'], bug_id, 'DUPLICATE', comment, dup_id=dup_id)
+        self._forget_bug(bug_id)
+        closeBug(self.client, bug_id, 'DUPLICATE', comment, dup_id=dup_id)
+
+    def _get_comment_scan(self, bug_id):
+        if bug_id not in self._comment_scans:
+            scan = self.comment_cache.get(self._comment_scan_key(bug_id)) if self.comment_cache else None
+            self._comment_scans[bug_id] = scan or {'has_landing_link': False, 'last_id': None, 'last_time': None}
+        return self._comment_scans[bug_id]
+
+    def _comment_scan_key(self, bug_id):
+        return self.config['url'] + "bug/%s/comment" % bug_id
 
     @logEntryExit
     def bug_has_landing_link(self, bug_id):
-        bug_comments = getBugComments(self.config['url'], bug_id)
-        return any(any(prefix in c for prefix in self.PROTECTED_LANDING_LINK_PREFIXES) for c in bug_comments)
+        scan = self._get_comment_scan(bug_id)
+        # Landing links are never removed, so once we've seen one we don't need to look again
+        if scan['has_landing_link']:
+            return True
+
+        new_since = None
+        if scan['last_time']:
+            # new_since has a resolution of seconds; go back one so we can't miss a
+            # comment made in the same second as the last one we saw.
+            new_since = (parse(scan['last_time']) - timedelta(seconds=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        bug_comments = getBugComments(self.client, bug_id, new_since=new_since)
+        if scan['last_id'] is not None:
+            bug_comments = [c for c in bug_comments if c.get('id', scan['last_id'] + 1) > scan['last_id']]
+        self.logger.log("Checking %s new comments on Bug %s for a landing link" % (len(bug_comments), bug_id), level=LogLevel.Debug)
+
+        scan['has_landing_link'] = any(any(prefix in c.get('text', '') for prefix in self.PROTECTED_LANDING_LINK_PREFIXES) for c in bug_comments)
+        # If Bugzilla didn't tell us the comments' ids and times we'll just have to read them all next time
+        seen = [c for c in bug_comments if 'id' in c and 'creation_time' in c]
+        if seen:
+            newest = max(seen, key=lambda c: c['id'])
+            scan['last_id'], scan['last_time'] = newest['id'], newest['creation_time']
+
+        if self.comment_cache:
+            self.comment_cache.set(self._comment_scan_key(bug_id), scan)
+        return scan['has_landing_link']
+
+    def _forget_bug(self, bug_id):
+        self._checked_bug_ids.discard(bug_id)
+        self._open_bugs.pop(bug_id, None)
+
+    def _query_open_bugs(self, bug_ids):
+        chunks = list(chunkBugIDs(sorted(set(bug_ids))))
+        if len(chunks) == 1:
+            results = [openBugsMetadata(self.client, chunks[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+                results = list(executor.map(lambda c: openBugsMetadata(self.client, c), chunks))
+
+        for chunk, open_bugs in zip(chunks, results):
+            self._checked_bug_ids.update(chunk)
+            self._open_bugs.update(open_bugs)
+
+    @logEntryExit
+    def prefetch_open_bugs(self, bug_ids):
+        """
+        Look up which of bug_ids (typically those of every job of every library we
+        are about to process) are open, so later calls to find_open_bugs_info can be
+        answered without going back to Bugzilla.
+        """
+        filtered_ids = [b for b in bug_ids if b and b > 0 and b not in self._checked_bug_ids]
+        if filtered_ids:
+            self._query_open_bugs(filtered_ids)
+        self.logger.log("Found %s open bugs out of %s" % (len(self._open_bugs), len(self._checked_bug_ids)), level=LogLevel.Info)
 
     @logEntryExit
     def find_open_bugs_info(self, bug_ids):
         filtered_ids = [b for b in bug_ids if b > 0]
         if len(filtered_ids) > 0:
-            return openBugsMetadata(self.config['url'], filtered_ids)
+            unchecked_ids = [b for b in filtered_ids if b not in self._checked_bug_ids]
+            if unchecked_ids:
+                self._query_open_bugs(unchecked_ids)
+            return {b: self._open_bugs[b] for b in sorted(set(filtered_ids)) if b in self._open_bugs}
         return []
 
     @logEntryExit
     def mark_ff_version_affected(self, bug_id, ff_version, affected=True):
-        return markFFVersionAffected(self.config['url'], self.config['apikey'], bug_id, ff_version, affected)
+        return markFFVersionAffected(self.client, bug_id, ff_version, affected)
+
+    # How many bugs we update with a single request in mark_bugs_ff_version_affected
+    FF_VERSION_UPDATE_CHUNK_SIZE = 100
+
+    @logEntryExit
+    def mark_bugs_ff_version_affected(self, bug_ids, ff_version, affected=True):
+        for i in range(0, len(bug_ids), self.FF_VERSION_UPDATE_CHUNK_SIZE):
+            markFFVersionsAffected(self.client, bug_ids[i:i + self.FF_VERSION_UPDATE_CHUNK_SIZE], ff_version, affected)
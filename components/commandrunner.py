@@ -10,6 +10,8 @@ import platform
 import subprocess
 from subprocess import PIPE
 
+from components.timing import timings, command_span_name
+
 
 def do_nothing(*args, **kwargs):
     print("Raw _run call:", *args)
@@ -50,8 +52,9 @@ def _run(args, shell, clean_return, errorlog=do_nothing, infolog=do_nothing, deb
     start = time.time()
     infolog("Running", args)
     try:
-        ret = subprocess.run(
-            args, shell=shell, stdout=PIPE, stderr=PIPE, timeout=60 * 20)
+        with timings.span("subprocess", command_span_name(args)):
+            ret = subprocess.run(
+                args, shell=shell, stdout=PIPE, stderr=PIPE, timeout=60 * 20)
     except subprocess.TimeoutExpired as e:
         ran_to_completion = False
         stdout = e.stdout
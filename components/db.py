@@ -8,6 +8,7 @@ from components.utilities import Struct
 from components.logging import logEntryExit
 from components.providerbase import BaseProvider, INeedsLoggingProvider
 from components.logging import LogLevel
+from components.timing import timings, query_span_name
 from components.dbmodels import TryRun, PhabRevision, transform_job_and_try_results_into_objects, JOBSTATUS, JOBOUTCOME, JOBTYPE
 
 import pymysql
@@ -16,7 +17,7 @@ import pymysql
 # ==================================================================================
 
 
-CURRENT_DATABASE_CONFIG_VERSION = 16
+CURRENT_DATABASE_CONFIG_VERSION = 17
 
 CREATION_QUERIES = {
     "config": """
@@ -58,7 +59,8 @@ CREATION_QUERIES = {
         `outcome` TINYINT NOT NULL,
         `relinquished` TINYINT NOT NULL,
         `bugzilla_id` INT NULL,
-        PRIMARY KEY (`id`)
+        PRIMARY KEY (`id`),
+        INDEX `idx_jobs_library_type_created` (`library`, `job_type`, `created`, `id`)
       ) ENGINE = InnoDB;
       """,
     "job_to_ff_version": """
@@ -174,7 +176,7 @@ class MySQLDatabase(BaseProvider, INeedsLoggingProvider):
                     cursor.execute("drop database " + self.database_config['db'])
 
     def _query_get_single(self, query):
-        with self.connection.cursor() as cursor:
+        with self.connection.cursor() as cursor, timings.span("db", query_span_name(query)):
             cursor.execute(query)
             results = cursor.fetchall()
             if len(results) != 1:
@@ -186,7 +188,7 @@ class MySQLDatabase(BaseProvider, INeedsLoggingProvider):
             return list(results[0].values())[0]
 
     def _query_get_rows(self, query, args=()):
-        with self.connection.cursor() as cursor:
+        with self.connection.cursor() as cursor, timings.span("db", query_span_name(query)):
             cursor.execute(query, args)
             results = cursor.fetchall()
             return results
@@ -200,10 +202,11 @@ class MySQLDatabase(BaseProvider, INeedsLoggingProvider):
 
     def _query_execute(self, query, args=()):
         insert_id = None
-        with self.connection.cursor() as cursor:
-            cursor.execute(query, args)
-            insert_id = cursor.lastrowid
-        self.connection.commit()
+        with timings.span("db", query_span_name(query)):
+            with self.connection.cursor() as cursor:
+                cursor.execute(query, args)
+                insert_id = cursor.lastrowid
+            self.connection.commit()
         return insert_id
 
     @logEntryExit
@@ -432,6 +435,11 @@ class MySQLDatabase(BaseProvider, INeedsLoggingProvider):
 
                         self._query_execute("ALTER TABLE jobs DROP phab_revision")
 
+                    if config_version <= 16 and CURRENT_DATABASE_CONFIG_VERSION >= 17:
+                        self.logger.log("Upgrading to database version 17", level=LogLevel.Warning)
+                        # We look up jobs by library and job type, most recent first
+                        self._query_execute("ALTER TABLE `jobs` ADD INDEX `idx_jobs_library_type_created` (`library`, `job_type`, `created`, `id`)")
+
                     query = "UPDATE config SET v=%s WHERE k = 'database_version'"
                     args = (CURRENT_DATABASE_CONFIG_VERSION)
                     self._query_execute(query, args)
@@ -500,35 +508,33 @@ class MySQLDatabase(BaseProvider, INeedsLoggingProvider):
         results = self._query_get_rows(query)
         return [Struct(**r) for r in results]
 
-    def _get_job_query(self):
-        query = """SELECT
-                j.*,
-                v.ff_version,
-
-                t.id as try_run_id,
-                j.id as try_run_job_id,
-                t.revision as try_run_revision,
-                t.purpose as try_run_purpose,
-
-                p.id as phab_revision_id,
-                j.id as phab_revision_job_id,
-                p.revision as phab_revision_revision,
-                p.purpose as phab_revision_purpose
-           FROM jobs as j
-           LEFT OUTER JOIN job_to_ff_version as v
-               ON j.id = v.job_id
-           LEFT OUTER JOIN try_runs as t
-               ON j.id = t.job_id
-           LEFT OUTER JOIN phab_revisions as p
-               ON j.id = p.job_id """
-        return query
+    def _get_jobs(self, where="", args=()):
+        """
+        Returns the Job objects for the jobs matching the WHERE clause given (which
+        refers to the jobs table as 'j'.)  Rather than joining everything together,
+        which would return a row for every combination of ff version, try run, and
+        phabricator revision for a job, we get the jobs and then each of the child
+        tables with their own query.
+        """
+        query = "SELECT j.* FROM jobs as j " + where + " ORDER BY j.created DESC, j.id DESC"
+        job_rows = self._query_get_rows(query, args)
+        if not job_rows:
+            return []
+
+        def get_child_rows(table, order_by):
+            query = "SELECT c.* FROM " + table + " as c INNER JOIN jobs as j ON j.id = c.job_id "
+            query += where + " ORDER BY " + order_by
+            return self._query_get_rows(query, args)
+
+        return transform_job_and_try_results_into_objects(
+            job_rows,
+            get_child_rows("job_to_ff_version", "c.job_id ASC, c.ff_version ASC"),
+            get_child_rows("try_runs", "c.id ASC"),
+            get_child_rows("phab_revisions", "c.id ASC"))
 
     @logEntryExit
     def get_all_jobs(self):
-        query = self._get_job_query()
-        query += "ORDER BY j.created DESC, j.id DESC"""
-        results = self._query_get_rows(query)
-        return transform_job_and_try_results_into_objects(results)
+        return self._get_jobs()
 
     @logEntryExit
     def get_all_try_runs(self):
@@ -543,24 +549,36 @@ class MySQLDatabase(BaseProvider, INeedsLoggingProvider):
         return [PhabRevision(r) for r in results]
 
     @logEntryExit
-    def get_all_jobs_for_library(self, library):
-        query = self._get_job_query()
-        query += "WHERE j.library = %s "
-        query += "ORDER BY j.created DESC, j.id DESC"""
-        args = (library.name)
-        results = self._query_get_rows(query, args)
-        return transform_job_and_try_results_into_objects(results)
+    def get_all_jobs_for_library(self, library, jobtype=None):
+        if jobtype is None:
+            return self._get_jobs("WHERE j.library = %s", (library.name))
+        return self._get_jobs("WHERE j.library = %s AND j.job_type = %s", (library.name, jobtype))
 
     @logEntryExit
-    def get_job(self, library, new_version):
-        query = self._get_job_query()
-        query += """WHERE j.library = %s
-                     AND j.version = %s """
-        query += " ORDER BY j.created DESC, j.id DESC"
+    def get_bug_ids_for_libraries(self, library_jobtypes):
+        """
+        The bug ids of all the jobs of the given (library, jobtype) pairs, without
+        loading the jobs themselves.
+        """
+        if not library_jobtypes:
+            return []
+        query = "SELECT bugzilla_id FROM jobs WHERE (library, job_type) IN (" + ", ".join(["(%s, %s)"] * len(library_jobtypes)) + ")"
+        args = tuple(a for (library, jobtype) in library_jobtypes for a in (library.name, jobtype))
+        return [r['bugzilla_id'] for r in self._query_get_rows(query, args)]
 
-        args = [library.name, new_version]
-        results = self._query_get_rows(query, args)
-        jobs = transform_job_and_try_results_into_objects(results)
+    @logEntryExit
+    def get_all_jobs_for_library_by_name(self, library_name):
+        pattern = "%" + library_name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        # LIKE follows the column's (case-insensitive) collation; BINARY keeps the
+        # substring match case-sensitive
+        return self._get_jobs("WHERE j.library LIKE BINARY %s", (pattern))
+
+    @logEntryExit
+    def get_job(self, library, new_version, jobtype=None):
+        if jobtype:
+            jobs = self._get_jobs("WHERE j.library = %s AND j.version = %s AND j.job_type = %s", [library.name, new_version, jobtype])
+        else:
+            jobs = self._get_jobs("WHERE j.library = %s AND j.version = %s", [library.name, new_version])
         return jobs[0] if jobs else None
 
     @logEntryExit
@@ -574,7 +592,8 @@ class MySQLDatabase(BaseProvider, INeedsLoggingProvider):
         args = (job_id, ff_version)
         self._query_execute(query, args)
 
-        return self.get_job(library, new_version)
+        jobs = self._get_jobs("WHERE j.id = %s", (job_id))
+        return jobs[0] if jobs else None
 
     def update_job_status(self, existing_job):
         query = "UPDATE jobs SET status=%s, outcome=%s WHERE id = %s"
@@ -599,17 +618,25 @@ class MySQLDatabase(BaseProvider, INeedsLoggingProvider):
         args = (existing_job.id, ff_version_to_add)
         self._query_execute(query, args)
 
+    @logEntryExit
+    def update_jobs_ff_versions(self, existing_jobs, ff_version_to_add):
+        if not existing_jobs:
+            return
+        query = "INSERT INTO job_to_ff_version(job_id, ff_version) VALUES" + ", ".join(["(%s, %s)"] * len(existing_jobs))
+        args = tuple(a for j in existing_jobs for a in (j.id, ff_version_to_add))
+        self._query_execute(query, args)
+
     @logEntryExit
     def add_try_run(self, existing_job, try_revision, try_run_type):
         query = "INSERT INTO try_runs(revision, job_id, purpose) VALUES(%s, %s, %s)"
         args = (try_revision, existing_job.id, try_run_type)
-        self._query_execute(query, args)
+        return self._query_execute(query, args)
 
     @logEntryExit
     def add_phab_revision(self, existing_job, phab_revision, phab_revision_type):
         query = "INSERT INTO phab_revisions(revision, job_id, purpose) VALUES(%s, %s, %s)"
         args = (phab_revision, existing_job.id, phab_revision_type)
-        self._query_execute(query, args)
+        return self._query_execute(query, args)
 
     @logEntryExit
     def delete_job(self, library=None, version=None, job_id=None):
@@ -5,18 +5,35 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 from components.db import MySQLDatabase
+from components.dbmodels import TryRun, PhabRevision
 from components.providerbase import BaseProvider, INeedsLoggingProvider
 from components.logging import LogLevel, logEntryExit
 
 
 class DatabaseProvider(BaseProvider, INeedsLoggingProvider):
+    """
+    While processing a library we ask for its jobs several times (the task runner,
+    the frequency check, the job we just created...) so we keep the jobs we've
+    loaded for a library in memory. Every write we make goes through the objects in
+    this cache as well as the database, so it stays accurate until initialize() or
+    reset(), which are called around each task, throw it away. (reset() is skipped
+    if a task raises, so initialize() must clear it too.)
+    """
     def __init__(self, database_config):
         self.config = database_config
         self.db = MySQLDatabase(self.config)
+        # (library name, job type) -> [Job], newest first
+        self._jobs_cache = {}
 
     def _update_config(self, config):
         self.db.update_config(config)
 
+    def _initialize(self):
+        self._jobs_cache = {}
+
+    def _reset(self):
+        self._jobs_cache = {}
+
     def updatebot_is_enabled(self):
         return self.db.updatebot_is_enabled()
 
@@ -45,23 +62,44 @@ class DatabaseProvider(BaseProvider, INeedsLoggingProvider):
         return self.db.get_all_phabricator_revisions()
 
     def get_all_jobs_for_library(self, library, jobtype):
-        jobs = self.db.get_all_jobs_for_library(library)
-        return [j for j in jobs if j.type == jobtype]
+        key = (library.name, jobtype)
+        if key not in self._jobs_cache:
+            self._jobs_cache[key] = self.db.get_all_jobs_for_library(library, jobtype)
+        return list(self._jobs_cache[key])
 
-    def get_all_jobs_for_library_by_name(self, library_name):
-        jobs = self.db.get_all_jobs()
-        return [j for j in jobs if library_name in j.library_shortname]
+    def get_bug_ids_for_libraries(self, library_jobtypes):
+        # Not cached: this is asked once, before the first task, and initialize() would throw the jobs away
+        return self.db.get_bug_ids_for_libraries(library_jobtypes)
 
-    def get_job(self, library, new_version):
-        return self.db.get_job(library, new_version)
+    def get_all_jobs_for_library_by_name(self, library_name):
+        return self.db.get_all_jobs_for_library_by_name(library_name)
+
+    def get_job(self, library, new_version, jobtype=None):
+        # We can only answer from the cache if we know which of its lists to look in
+        key = (library.name, jobtype)
+        if jobtype and key in self._jobs_cache:
+            for j in self._jobs_cache[key]:
+                if j.version == new_version:
+                    return j
+            return None
+        return self.db.get_job(library, new_version, jobtype)
 
     # Only used for testing purposes, in the real database, we don't delete records.
     def delete_job(self, library=None, version=None, job_id=None):
+        self._jobs_cache = {}
         return self.db.delete_job(library=library, version=version, job_id=job_id)
 
     def create_job(self, jobtype, library, new_version, status, outcome, bug_id=0):
         assert self.config['General']['ff-version'], "Called create_job but self.config['General']['ff-version'] was not provided"
-        return self.db.create_job(jobtype, library, new_version, self.config['General']['ff-version'], status, outcome, bug_id)
+        new_job = self.db.create_job(jobtype, library, new_version, self.config['General']['ff-version'], status, outcome, bug_id)
+
+        key = (library.name, jobtype)
+        if new_job and key in self._jobs_cache:
+            jobs = self._jobs_cache[key]
+            if jobs:
+                new_job.prior_job = jobs[0]
+            jobs.insert(0, new_job)
+        return new_job
 
     @logEntryExit
     def update_job_status(self, existing_job, newstatus=None, newoutcome=None):
@@ -76,16 +114,25 @@ class DatabaseProvider(BaseProvider, INeedsLoggingProvider):
         return self.db.update_job_relinquish(existing_job)
 
     def update_job_add_bug_id(self, existing_job, bug_id):
+        existing_job.bugzilla_id = bug_id
         return self.db.update_job_add_bug_id(existing_job, bug_id)
 
     def update_job_ff_versions(self, existing_job, ff_version_to_add):
+        existing_job.ff_versions.add(ff_version_to_add)
         return self.db.update_job_ff_versions(existing_job, ff_version_to_add)
 
+    def update_jobs_ff_versions(self, existing_jobs, ff_version_to_add):
+        for j in existing_jobs:
+            j.ff_versions.add(ff_version_to_add)
+        return self.db.update_jobs_ff_versions(existing_jobs, ff_version_to_add)
+
     def add_try_run(self, existing_job, try_revision, try_run_type):
-        return self.db.add_try_run(existing_job, try_revision, try_run_type)
+        try_run_id = self.db.add_try_run(existing_job, try_revision, try_run_type)
+        existing_job.try_runs.append(TryRun({'id': try_run_id, 'revision': try_revision, 'job_id': existing_job.id, 'purpose': try_run_type}))
 
     def add_phab_revision(self, existing_job, phab_revision, phab_revision_type):
-        return self.db.add_phab_revision(existing_job, phab_revision, phab_revision_type)
+        phab_revision_id = self.db.add_phab_revision(existing_job, phab_revision, phab_revision_type)
+        existing_job.phab_revisions.append(PhabRevision({'id': phab_revision_id, 'revision': phab_revision, 'job_id': existing_job.id, 'purpose': phab_revision_type}))
 
     def print(self, library_filter=None):
         def get_column_widths(objects, columns):
@@ -62,31 +62,27 @@ class JOBTYPE(IntEnum):
     COMMITALERT = 2
 
 
-def transform_job_and_try_results_into_objects(rows):
+def transform_job_and_try_results_into_objects(job_rows, ff_version_rows, try_run_rows, phab_revision_rows):
     """
-    In this function we are given an array of rows where the firefox
-    versions, phab revisions, and try runs have been left-outer-joined
-    into the jobs table, so we have duplicate job data.
-    We're going to transform this data into objects
+    In this function we are given the rows of the jobs table we are interested in,
+    and the rows of each child table (firefox versions, try runs, and phab revisions)
+    that belong to those jobs. We're going to transform this data into objects.
     """
     jobs = {}
-    for r in rows:
-        # This will recreate the Job object a bunch of times, but that's fine, whateber
+    for r in job_rows:
         jobs[r['id']] = Job(r)
 
-    for r in rows:
-        if r['ff_version']:
-            jobs[r['id']].ff_versions.add(r['ff_version'])
-        if r['try_run_id']:
-            # Ensure we only add a try run once
-            new = TryRun(r, column_prefix='try_run_')
-            if not any([t for t in jobs[r['id']].try_runs if t.id == new.id]):
-                jobs[r['id']].try_runs.append(new)
-        if r['phab_revision_id']:
-            # Ensure we only add a phabricator revision once
-            new = PhabRevision(r, column_prefix='phab_revision_')
-            if not any([t for t in jobs[r['id']].phab_revisions if t.id == new.id]):
-                jobs[r['id']].phab_revisions.append(new)
+    # If a job was added between our queries, we may see children for a job we
+    # don't have; we ignore them.
+    for r in ff_version_rows:
+        if r['job_id'] in jobs:
+            jobs[r['job_id']].ff_versions.add(r['ff_version'])
+    for r in try_run_rows:
+        if r['job_id'] in jobs:
+            jobs[r['job_id']].try_runs.append(TryRun(r))
+    for r in phab_revision_rows:
+        if r['job_id'] in jobs:
+            jobs[r['job_id']].phab_revisions.append(PhabRevision(r))
 
     # Make sure the try runs are in ascending order. Uses a database-internal
     # key which is a bad practice, because what if the key turns into a guid
@@ -0,0 +1,122 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+
+class DiskCache:
+    """
+    A directory of JSON documents, one file per key. An entry is stored either
+    with a time-to-live (for things that may still change) or permanently (for
+    things that never will.) Reading an entry marks it as recently used, and
+    whenever the cache grows beyond max_size bytes the least recently used
+    entries are removed. To avoid listing the directory on every write we keep
+    a running total of its size; it only counts our own writes, so it is
+    corrected each time we do list the directory.
+
+    Entries are written to a temporary file and renamed into place, so readers
+    (in this or another process) never see a partial entry.
+    """
+
+    def __init__(self, path, max_size):
+        self.path = path
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        # The total size of the entries, as of the last evict() plus our writes since
+        self._size = None
+
+        os.makedirs(self.path, exist_ok=True)
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, hashlib.sha1(key.encode()).hexdigest() + ".json")
+
+    def get(self, key):
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # Guard against a (vanishingly unlikely) hash collision
+        if entry.get('key') != key:
+            return None
+        if entry['expires'] is not None and entry['expires'] < time.time():
+            self.delete(key)
+            return None
+
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return entry['value']
+
+    def set(self, key, value, ttl=None):
+        """
+        Store value (which must be JSON-serializable) under key. If ttl is given the
+        entry expires after that many seconds, otherwise it is kept until evicted.
+        """
+        entry = {
+            'key': key,
+            'expires': time.time() + ttl if ttl is not None else None,
+            'value': value
+        }
+        entry_path = self._entry_path(key)
+        tmp_path = "%s.%s.%s.tmp" % (entry_path, os.getpid(), threading.get_ident())
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        added = os.path.getsize(tmp_path) - self._file_size(entry_path)
+        os.replace(tmp_path, entry_path)
+
+        with self._lock:
+            if self._size is not None:
+                self._size += added
+            over_size = self._size is None or self._size > self.max_size
+        if over_size:
+            self.evict()
+
+    def delete(self, key):
+        entry_path = self._entry_path(key)
+        removed = self._file_size(entry_path)
+        try:
+            os.remove(entry_path)
+        except OSError:
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size -= removed
+
+    def _file_size(self, path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def evict(self):
+        with self._lock:
+            entries = []
+            for f in os.listdir(self.path):
+                if not f.endswith(".json"):
+                    continue
+                try:
+                    st = os.stat(os.path.join(self.path, f))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, f))
+
+            total = sum(e[1] for e in entries)
+            # Oldest first
+            for (last_used, size, f) in sorted(entries):
+                if total <= self.max_size:
+                    break
+                try:
+                    os.remove(os.path.join(self.path, f))
+                except OSError:
+                    pass
+                total -= size
+            self._size = total
@@ -0,0 +1,182 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import os
+import time
+import shutil
+import hashlib
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from components.logging import LogLevel
+
+
+class MirrorLock:
+    """
+    An flock()-based lock on a file beside a mirror. Shared locks are held by
+    anyone with a checkout borrowing objects from the mirror; exclusive locks are
+    taken to create, fetch into, or evict it. Works across threads and processes.
+    """
+
+    def __init__(self, path, shared=False, blocking=True):
+        self.path = path
+        self.shared = shared
+        self.blocking = blocking
+        self._fd = None
+
+    def acquire(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        flags = fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX
+        if not self.blocking:
+            flags |= fcntl.LOCK_NB
+        try:
+            fcntl.flock(self._fd, flags)
+        except BlockingIOError:
+            os.close(self._fd)
+            self._fd = None
+            return False
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+class GitMirrorCache:
+    """
+    A directory of bare 'git clone --mirror' repositories, one per upstream URL.
+
+    A mirror is created the first time we see a repository and afterwards only
+    updated with an incremental fetch (at most once per process.) Checkouts are made
+    with 'git clone --shared' from the mirror, which borrows the mirror's objects
+    through alternates (the same mechanism as --reference) and does not touch the
+    network. Checkouts hold a shared lock on the mirror until they are released so
+    that eviction, which keeps the cache under max_size bytes by removing the least
+    recently used mirrors, never removes one that is in use.
+    """
+
+    def __init__(self, path, max_size, run, logger):
+        self.path = path
+        self.max_size = max_size
+        self.run = run
+        self.logger = logger
+
+        self._refreshed = set()
+        self._refreshed_lock = threading.Lock()
+
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def is_supported():
+        return fcntl is not None
+
+    def _key(self, repo_url):
+        return hashlib.sha1(repo_url.encode()).hexdigest()
+
+    def mirror_path(self, repo_url):
+        return os.path.join(self.path, self._key(repo_url) + ".git")
+
+    def _lock_path(self, mirror_path):
+        return mirror_path[:-len(".git")] + ".lock"
+
+    def refresh(self, repo_url):
+        mirror = self.mirror_path(repo_url)
+        with self._refreshed_lock:
+            if repo_url in self._refreshed and os.path.isdir(mirror):
+                return mirror
+
+        with MirrorLock(self._lock_path(mirror)):
+            if os.path.isdir(mirror):
+                self.logger.log("Updating the mirror of %s in %s" % (repo_url, mirror), level=LogLevel.Info)
+                self.run(["git", "--git-dir", mirror, "fetch", "--prune", "--tags", "origin"])
+            else:
+                self.logger.log("Creating a mirror of %s in %s" % (repo_url, mirror), level=LogLevel.Info)
+                tmp_mirror = mirror + ".tmp"
+                shutil.rmtree(tmp_mirror, ignore_errors=True)
+                self.run(["git", "clone", "--mirror", repo_url, tmp_mirror])
+                os.rename(tmp_mirror, mirror)
+            os.utime(mirror)
+
+        with self._refreshed_lock:
+            self._refreshed.add(repo_url)
+
+        self.evict(keep=mirror)
+        return mirror
+
+    def checkout(self, repo_url, destination):
+        """
+        Refresh the mirror for repo_url and clone it into destination. Returns the
+        shared lock protecting the mirror, which the caller must release once it is
+        done with the checkout.
+        """
+        for attempt in range(2):
+            mirror = self.refresh(repo_url)
+            lock = MirrorLock(self._lock_path(mirror), shared=True)
+            lock.acquire()
+            if os.path.isdir(mirror):
+                break
+            # The mirror was evicted between our refresh and taking the lock
+            lock.release()
+            with self._refreshed_lock:
+                self._refreshed.discard(repo_url)
+        else:
+            raise Exception("Could not obtain a mirror of %s in %s" % (repo_url, self.path))
+
+        try:
+            self.run(["git", "clone", "--shared", mirror, destination])
+            os.utime(mirror)
+        except Exception:
+            lock.release()
+            raise
+        return lock
+
+    def _size(self, directory):
+        total = 0
+        for root, dirs, files in os.walk(directory):
+            for f in files:
+                try:
+                    total += os.lstat(os.path.join(root, f)).st_size
+                except OSError:
+                    pass
+        return total
+
+    def evict(self, keep=None):
+        mirrors = []
+        for d in os.listdir(self.path):
+            if not d.endswith(".git"):
+                continue
+            mirror = os.path.join(self.path, d)
+            mirrors.append((os.stat(mirror).st_mtime, mirror, self._size(mirror)))
+
+        total = sum(m[2] for m in mirrors)
+        # Oldest first
+        for (last_used, mirror, size) in sorted(mirrors):
+            if total <= self.max_size:
+                break
+            if mirror == keep:
+                continue
+
+            lock = MirrorLock(self._lock_path(mirror), blocking=False)
+            if not lock.acquire():
+                self.logger.log("Mirror %s is over the cache size limit but is in use, not evicting it." % mirror, level=LogLevel.Info)
+                continue
+            try:
+                self.logger.log("Evicting mirror %s (%s bytes, last used %s)" % (mirror, size, time.ctime(last_used)), level=LogLevel.Info)
+                shutil.rmtree(mirror, ignore_errors=True)
+                total -= size
+            finally:
+                lock.release()
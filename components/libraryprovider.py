@@ -5,13 +5,22 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 import os
+import json
 import yaml
+import hashlib
 import platform
 import functools
 
 from components.logging import LogLevel
 from components.providerbase import BaseProvider, INeedsCommandProvider, INeedsLoggingProvider
 
+# The libyaml-backed loader is much faster than the pure-Python one; both treat
+# every scalar as a string, so they produce identical results for us.
+try:
+    from yaml import CBaseLoader as YamlLoader
+except ImportError:
+    from yaml import BaseLoader as YamlLoader
+
 
 # Library metadata from moz.yaml files that we care about and example values
 # NOTE: yaml_path is provided at import and may change based on the gecko-path
@@ -162,42 +171,132 @@ def get_key_or_default(key, dict, default):
     return dict[key] if key in dict else default
 
 
+# Bump this whenever validate_library changes what it produces, so that
+# indexes written by an older version are thrown away.
+LIBRARY_INDEX_VERSION = 1
+LIBRARY_INDEX_FILENAME = "updatebot-library-index.json"
+
+
 class LibraryProvider(BaseProvider, INeedsCommandProvider, INeedsLoggingProvider):
+    """
+    Finding and parsing every moz.yaml in mozilla-central is slow, so we keep an
+    index of the moz.yaml files we've seen (keyed by path, with their mtime, size,
+    content hash and validated contents.) A file is only re-parsed if its mtime or
+    size changed and its contents actually differ.
+
+    The index is stored at index_path if given in the config, otherwise inside the
+    .hg directory of the checkout. In a Mercurial checkout we also find the files
+    using 'hg files', which reads the dirstate instead of walking the tree.
+    """
     def __init__(self, config):
         self._libraries = None
+        self._index_path = config.get('index_path', None)
+
+    def _find_mozyamls(self, gecko_path):
+        if os.path.isdir(os.path.join(gecko_path, ".hg")):
+            command = ["hg", "files", "--cwd", gecko_path, "glob:**/moz.yaml"]
+            ret = self.run(command, clean_return=False)
+            if ret.returncode == 0:
+                return [os.path.join(gecko_path, f.strip()) for f in ret.stdout.decode().strip().split("\n") if f.strip()]
+            self.logger.log("Could not list the moz.yaml files with hg, falling back to searching the tree.", level=LogLevel.Warning)
+
+        if platform.system() == 'Windows':
+            # dir is not an executable but a built-in of the Windows shell, so we need to run
+            # this with shell=True
+            command = ["dir", "/B", "/S", os.path.join(gecko_path, "moz.yaml")]
+            mozilla_central_yamls = self.run(" ".join(command), shell=True).stdout.decode()
+        else:
+            command = ["find", gecko_path, "-type", "f", "-name", "moz.yaml"]
+            mozilla_central_yamls = self.run(command).stdout.decode()
+
+        # strip() is needed to remove the Windows trailing \r
+        return [f.strip() for f in mozilla_central_yamls.strip().split("\n") if f.strip()]
+
+    def _get_index_path(self, gecko_path):
+        if self._index_path:
+            return self._index_path
+        if os.path.isdir(os.path.join(gecko_path, ".hg")):
+            return os.path.join(gecko_path, ".hg", LIBRARY_INDEX_FILENAME)
+        return None
+
+    def _load_index(self, index_path):
+        if not index_path or not os.path.exists(index_path):
+            return {}
+        try:
+            with open(index_path, "r") as f:
+                index = json.load(f)
+        except Exception as e:
+            self.logger.log("Could not read the library index at %s, rebuilding it: %s" % (index_path, e), level=LogLevel.Warning)
+            return {}
+        if index.get('version') != LIBRARY_INDEX_VERSION or index.get('platform') != platform.system().lower():
+            return {}
+        return index.get('files', {})
+
+    def _save_index(self, index_path, files):
+        if not index_path:
+            return
+        index = {
+            'version': LIBRARY_INDEX_VERSION,
+            'platform': platform.system().lower(),
+            'files': files
+        }
+        try:
+            with open(index_path + ".tmp", "w") as f:
+                json.dump(index, f)
+            os.replace(index_path + ".tmp", index_path)
+        except Exception as e:
+            self.logger.log("Could not write the library index to %s: %s" % (index_path, e), level=LogLevel.Warning)
 
     def get_libraries(self, gecko_path):
         if self._libraries is None:
             libraries = []
-            if platform.system() == 'Windows':
-                # dir is not an executable but a built-in of the Windows shell, so we need to run
-                # this with shell=True
-                command = ["dir", "/B", "/S", os.path.join(gecko_path, "moz.yaml")]
-                mozilla_central_yamls = self.run(" ".join(command), shell=True).stdout.decode()
-            else:
-                command = ["find", gecko_path, "-type", "f", "-name", "moz.yaml"]
-                mozilla_central_yamls = self.run(command).stdout.decode()
-
-            mozilla_central_yamls = mozilla_central_yamls.strip().split("\n")
-            for file in mozilla_central_yamls:
-                file = file.strip()  # Needed to remove the Windows trailing \r
-                if not file:
-                    continue
-                with open(file, "r") as mozyaml:
-                    self.logger.log("Processing", file, level=LogLevel.Info)
-                    # Only return libraries that have enabled tasks
-                    new_library_obj = LibraryProvider.validate_library(mozyaml.read(), file.replace(gecko_path + os.path.sep, ""))
-                    if new_library_obj.tasks:
-                        self.logger.log("%s had %s Updatebot tasks" % (file, len(new_library_obj.tasks)), level=LogLevel.Info)
-                        libraries.append(new_library_obj)
-
+            index_path = self._get_index_path(gecko_path)
+            old_index = self._load_index(index_path)
+            new_index = {}
+
+            for file in self._find_mozyamls(gecko_path):
+                yaml_path = file.replace(gecko_path + os.path.sep, "")
+                st = os.stat(file)
+                entry = old_index.get(yaml_path)
+
+                if entry and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+                    self.logger.log("Using the indexed contents of", file, level=LogLevel.Debug)
+                else:
+                    with open(file, "rb") as mozyaml:
+                        contents = mozyaml.read()
+                    content_hash = hashlib.sha256(contents).hexdigest()
+                    if not entry or entry['sha256'] != content_hash:
+                        self.logger.log("Processing", file, level=LogLevel.Info)
+                        entry = {
+                            'sha256': content_hash,
+                            'library': LibraryProvider._validate_library_dict(contents.decode(), yaml_path)
+                        }
+                    else:
+                        # Don't modify old_index's entry, or we wouldn't see that the index changed
+                        entry = dict(entry)
+                    entry['mtime_ns'] = st.st_mtime_ns
+                    entry['size'] = st.st_size
+                new_index[yaml_path] = entry
+
+                # Only return libraries that have enabled tasks
+                new_library_obj = Library(entry['library'])
+                if new_library_obj.tasks:
+                    self.logger.log("%s had %s Updatebot tasks" % (file, len(new_library_obj.tasks)), level=LogLevel.Info)
+                    libraries.append(new_library_obj)
+
+            if new_index != old_index:
+                self._save_index(index_path, new_index)
             self._libraries = libraries
 
         return self._libraries
 
     @staticmethod
     def validate_library(yaml_contents, yaml_path):
-        library = yaml.load(yaml_contents, Loader=yaml.BaseLoader)
+        return Library(LibraryProvider._validate_library_dict(yaml_contents, yaml_path))
+
+    @staticmethod
+    def _validate_library_dict(yaml_contents, yaml_path):
+        library = yaml.load(yaml_contents, Loader=YamlLoader)
 
         validated_library = {
             'name': '',
@@ -269,7 +368,7 @@ class LibraryProvider(BaseProvider, INeedsCommandProvider, INeedsLoggingProvider
                 raise Exception("If a library has Updatebot Tasks, then it must specify an upstream repository url")
             if not validated_library['revision']:
                 raise Exception("If a library has Updatebot Tasks, then it must specify a current revision")
-        return Library(validated_library)
+        return validated_library
 
     @staticmethod
     def validate_task(task_dict, library_name):
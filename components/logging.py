@@ -13,6 +13,7 @@ from sentry_sdk import init as sentry_init, add_breadcrumb, capture_exception, c
 
 from components.providerbase import BaseProvider
 from components.commandrunner import _run
+from components.timing import timings
 
 
 @unique
@@ -25,6 +26,26 @@ class LogLevel(IntEnum):
     Debug2 = 6
 
 
+class LazyString:
+    """
+    A log argument whose text is only built (once) if a logger actually writes
+    it out. Use it instead of formatting large objects into a message up front.
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self._value = None
+
+    def __str__(self):
+        if self._value is None:
+            self._value = str(self.func())
+        return self._value
+
+
+def _truncate(s, length=100):
+    return s[0:length] + "..." if len(s) > length else s
+
+
 def logEntryExit(func, print_arg_list=True, header_line=False):
     @wraps(func)
     def func_wrapper(*args, **kwargs):
@@ -34,15 +55,16 @@ def logEntryExit(func, print_arg_list=True, header_line=False):
             obj.logger.log("================================================", level=LogLevel.Info)
         obj.logger.log("================================================", level=LogLevel.Debug)
         obj.logger.log("Beginning %s" % func.__qualname__, level=LogLevel.Info)
-        obj.logger.log(" Arguments: %s" % (str(args) + " " + str(kwargs) if print_arg_list else "[Omitted %s args]" % str(len(args) + len(kwargs))), level=LogLevel.Debug)
-        ret = func(*args, **kwargs)
-        if ret is list:
+        if print_arg_list:
+            obj.logger.log(" Arguments:", LazyString(lambda: str(args) + " " + str(kwargs)), level=LogLevel.Debug)
+        else:
+            obj.logger.log(" Arguments: [Omitted %s args]" % (len(args) + len(kwargs)), level=LogLevel.Debug)
+        with timings.span("function", func.__qualname__):
+            ret = func(*args, **kwargs)
+        if isinstance(ret, list):
             obj.logger.log("Function returned a list of %s objects" % len(ret), level=LogLevel.Debug)
         else:
-            return_string = str(ret)
-            if len(return_string) > 100:
-                return_string = return_string[0:100] + "..."
-            obj.logger.log("Function returned %s" % return_string, level=LogLevel.Debug)
+            obj.logger.log("Function returned", LazyString(lambda: _truncate(str(ret))), level=LogLevel.Debug)
         obj.logger.log("Ending %s" % func.__qualname__, level=LogLevel.Info)
         return ret
     return func_wrapper
@@ -70,7 +92,8 @@ class LoggingProvider(BaseProvider):
         if LoggingProvider.context != "":
             category = f"{category} {LoggingProvider.context}"
         for logger in self.loggers:
-            logger.log(*args, level=level, category=category)
+            if logger.accepts(level, category):
+                logger.log(*args, level=level, category=category)
 
     def log_exception(self, e):
         for logger in self.loggers:
@@ -91,6 +114,9 @@ class LoggerInstance(BaseProvider):
     def __init__(self):
         pass
 
+    def accepts(self, level, category):
+        return True
+
     def log(self, *args, level, category):
         assert False, "Subclass should implement this function"
 
@@ -111,10 +137,13 @@ class LocalLogger(LoggerInstance):
 
         self.log_component = os.environ.get('UPDATEBOT_LOG_COMPONENT', "").lower()
 
-    def log(self, *args, level, category):
+    def accepts(self, level, category):
         if category and self.log_component not in category.lower():
-            return
-        if level.value <= self.min_log_level:
+            return False
+        return level.value <= self.min_log_level
+
+    def log(self, *args, level, category):
+        if self.accepts(level, category):
             prefix = ("[" + level.name + "]").ljust(9)
             prefix += ("(" + category + ")") if category else ""
             print(prefix, *args, flush=True)
@@ -132,6 +161,8 @@ class SentryLogger(LoggerInstance):
         assert 'sentry_config' in config, "Sentry logger requires a sentry_config key"
         assert 'url' in config['sentry_config'], "Sentry logger requires a url key in sentry_config"
         self.config = config
+        # By default every message is kept as a breadcrumb
+        self.min_log_level = LogLevel(config['sentry_config'].get('breadcrumb_level', LogLevel.Debug2))
 
     def _update_config(self, additional_config):
         version = "updatebot-"
@@ -153,14 +184,26 @@ class SentryLogger(LoggerInstance):
         with configure_scope() as scope:
             if "TASK_ID" in os.environ:
                 scope.set_extra("TASK_ID", os.environ['TASK_ID'])
+            scope.add_event_processor(_format_breadcrumbs)
+
+    def accepts(self, level, category):
+        return level.value <= self.min_log_level
 
     def log(self, *args, level, category):
-        add_breadcrumb(category=category, level=level, message=" ".join([str(i) for i in args]))
+        # Most breadcrumbs are never sent, so their text is only built if an event is
+        add_breadcrumb(category=category, level=level, message=LazyString(lambda: " ".join([str(i) for i in args])))
 
     def log_exception(self, e):
         capture_exception(e)
 
 
+def _format_breadcrumbs(event, hint):
+    for crumb in event.get('breadcrumbs', {}).get('values', []):
+        if isinstance(crumb.get('message', None), LazyString):
+            crumb['message'] = str(crumb['message'])
+    return event
+
+
 class SimpleLogger(LoggingProvider):
     def __init__(self, config=None):
         super().__init__(config or {'local': True})
@@ -4,9 +4,7 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
-import copy
 import inspect
-import functools
 
 
 class BaseProvider:
@@ -19,24 +17,47 @@ class BaseProvider:
     be present on a derived class also.
     """
 
-    def _call_on_subclasses(self, method, *args):
+    LIFECYCLE_METHODS = ['_update_config', '_initialize', '_reset']
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._dispatch_table = {m: cls._build_dispatch(m) for m in BaseProvider.LIFECYCLE_METHODS}
+
+    @classmethod
+    def _build_dispatch(cls, method):
         """
-        _call_on_subclasses iterates through all the classes in the inheritence chain
-        and looks for a method on that class. If it is present it is called.
+        _build_dispatch iterates through all the classes in the inheritence chain
+        and looks for a method on that class, returning the list of them in the
+        order they should be called.
 
         One wrinkle here is that if the derived class (the class of the variable;
         i.e. not any superclasses) inherits from any class with _update_config,
         and doesn't define its own, then one of the _update_config functions on
         the base classes will be called twice. This shouldn't matter.
         """
-
-        classes = self.__class__.mro()
+        functions = []
+        classes = cls.mro()
         classes.reverse()
         for c in classes:
-            methods = inspect.getmembers(c, predicate=inspect.isfunction)
-            for m in methods:
-                if m[0] == method:
-                    m[1](self, *args)
+            f = getattr(c, method, None)
+            if inspect.isfunction(f):
+                functions.append(f)
+        return functions
+
+    def _call_on_subclasses(self, method, *args):
+        """
+        The list of methods to call is computed once per class (for the lifecycle
+        methods, when the class is created) because Updatebot calls initialize()
+        and reset() on every provider for every task it processes.
+        """
+        cls = self.__class__
+        if '_dispatch_table' not in cls.__dict__:
+            cls._dispatch_table = {}
+        if method not in cls._dispatch_table:
+            cls._dispatch_table[method] = cls._build_dispatch(method)
+
+        for f in cls._dispatch_table[method]:
+            f(self, *args)
 
     def update_config(self, config):
         """
@@ -70,6 +91,30 @@ class INeedsCommandProvider:
         self.run = config['CommandProvider'].run
 
 
+class CategoryLogger:
+    """
+    A view of a LoggingProvider that logs everything under one category. It
+    shares the provider's loggers rather than copying them, so every provider
+    can cheaply have its own.
+    """
+
+    def __init__(self, provider, category):
+        self.provider = provider
+        self.category = category
+
+    def log(self, *args, **kwargs):
+        self.provider.log(*args, category=self.category, **kwargs)
+
+    def log_exception(self, e):
+        self.provider.log_exception(e)
+
+    def set_context(self, *args, **kwargs):
+        self.provider.set_context(*args, **kwargs)
+
+    def clear_context(self):
+        self.provider.clear_context()
+
+
 class INeedsLoggingProvider:
     """
     An interface class for Providers that need access to logging
@@ -78,5 +123,4 @@ class INeedsLoggingProvider:
     def _update_config(self, config):
         if 'LoggingProvider' not in config:
             raise Exception("Config passed to INeedsLoggingProvider._update_config is missing 'LoggingProvider' key, which must be a class instance implementing the 'LoggingProvider' interface")
-        self.logger = copy.deepcopy(config['LoggingProvider'])
-        self.logger.log = functools.partial(self.logger.log, category=self.__class__.mro()[0].__name__)
+        self.logger = CategoryLogger(config['LoggingProvider'], self.__class__.mro()[0].__name__)
@@ -9,6 +9,7 @@ import tempfile
 import functools
 
 from components.utilities import Memoize
+from components.gitmirror import GitMirrorCache
 from components.logging import LogLevel, logEntryExit
 from components.providerbase import BaseProvider, INeedsCommandProvider, INeedsLoggingProvider
 
@@ -30,6 +31,12 @@ def repo_and_commit_to_url(repo, commit):
     return repo.replace(".git", "") + "/commit/" + commit
 
 
+# The format used to get the details of many commits in a single 'git log --name-status'.
+# Each commit starts with a record separator, and its fields are separated by unit
+# separators; the name-status lines for the commit follow the last field.
+COMMIT_DETAILS_FORMAT = "tformat:%x1e%H%x1f%s%x1f%an <%ae>%x1f%b%x1f"
+
+
 class Commit:
     def __init__(self, pretty_line):
         parts = pretty_line.split("|")
@@ -50,8 +57,32 @@ class Commit:
 
         rev_range = [self.revision + "^", self.revision]
 
-        files_changed = run(["git", "diff", "--name-status"] + rev_range).stdout.decode().split("\n")
-        for f in files_changed:
+        self._populate_files(run(["git", "diff", "--name-status"] + rev_range).stdout.decode())
+
+        self.summary = run(["git", "log", "--pretty=%s", "-1", self.revision]).stdout.decode()
+        self.author = run(["git", "log", "--pretty=%an <%ae>", "-1", self.revision]).stdout.decode()
+        self.description = run(["git", "log", "--pretty=%b", "-1", self.revision]).stdout.decode()
+        self.revision_link = repo_and_commit_to_url(repo, self.revision)
+        self.populated = True
+
+    def populate_details_from_log(self, repo, summary, author, description, files_changed):
+        """
+        Populate the commit from one record of COMMIT_DETAILS_FORMAT. The values match
+        what populate_details would get, including the trailing newline each of
+        the individual 'git log' calls would output.
+        """
+        if self.populated:
+            return
+
+        self._populate_files(files_changed)
+        self.summary = summary + "\n"
+        self.author = author + "\n"
+        self.description = description + "\n"
+        self.revision_link = repo_and_commit_to_url(repo, self.revision)
+        self.populated = True
+
+    def _populate_files(self, files_changed):
+        for f in files_changed.split("\n"):
             f = f.strip()
             if not f:
                 continue
@@ -66,12 +97,6 @@ class Commit:
             else:
                 self.files_other.append(parts[0] + " " + parts[1])
 
-        self.summary = run(["git", "log", "--pretty=%s", "-1", self.revision]).stdout.decode()
-        self.author = run(["git", "log", "--pretty=%an <%ae>", "-1", self.revision]).stdout.decode()
-        self.description = run(["git", "log", "--pretty=%b", "-1", self.revision]).stdout.decode()
-        self.revision_link = repo_and_commit_to_url(repo, self.revision)
-        self.populated = True
-
     def __eq__(self, other):
         if isinstance(other, Commit):
             return self.revision == other.revision
@@ -93,15 +118,44 @@ def _contains_commit(list_of_commits, revision):
 
 class SCMProvider(BaseProvider, INeedsCommandProvider, INeedsLoggingProvider):
     def __init__(self, config):
-        pass
+        # If a mirror cache path is given, we keep a mirror of every upstream repository
+        # there and clone from it, rather than cloning from the network every time.
+        self.mirror_cache_path = config.get('mirror_cache_path', None)
+        self.mirror_cache_max_size = int(config.get('mirror_cache_max_size_mb', 20 * 1024)) * 1024 * 1024
+        self.mirrors = None
+        self._mirror_lock = None
+
+    def _update_config(self, config):
+        if self.mirror_cache_path:
+            if GitMirrorCache.is_supported():
+                self.mirrors = GitMirrorCache(self.mirror_cache_path, self.mirror_cache_max_size, self.run, self.logger)
+            else:
+                self.logger.log("A mirror cache was configured, but it is not supported on this platform. Ignoring it.", level=LogLevel.Warning)
 
     def _initialize(self):
+        # reset() isn't called if the previous task raised, and we mustn't keep its
+        # mirror locked (which would stop it being fetched into or evicted)
+        self._release_mirror_lock()
         self.tmpdirname = tempfile.mkdtemp()
         self.previous_dir_stack = list()  # We use this as a Stack with append/pop
         self._has_checkedout = False
 
     def _reset(self):
         shutil.rmtree(self.tmpdirname, ignore_errors=True)
+        self._release_mirror_lock()
+
+    def _release_mirror_lock(self):
+        if self._mirror_lock:
+            self._mirror_lock.release()
+            self._mirror_lock = None
+
+    def prefetch(self, repo_url):
+        """
+        Bring the mirror of repo_url up to date, if we are using a mirror cache.
+        This does not change directory, so it is safe to call from several threads at once.
+        """
+        if self.mirrors:
+            self.mirrors.refresh(repo_url)
 
     def _ensure_checkout(self, repo_url, specific_revision=None):
         self.previous_dir_stack.append(os.getcwd())
@@ -112,7 +166,10 @@ class SCMProvider(BaseProvider, INeedsCommandProvider, INeedsLoggingProvider):
             if not repo_url:
                 raise Exception("Wound up in _ensure_checkout but missing a repo_url")
 
-            self.run(["git", "clone", repo_url, "."])
+            if self.mirrors:
+                self._mirror_lock = self.mirrors.checkout(repo_url, ".")
+            else:
+                self.run(["git", "clone", repo_url, "."])
 
             if specific_revision:
                 self.run(["git", "checkout", specific_revision])
@@ -206,9 +263,9 @@ class SCMProvider(BaseProvider, INeedsCommandProvider, INeedsLoggingProvider):
                 unseen_new_upstream_commits = all_new_upstream_commits
 
             # Step 7: Populate the lists with additional details about the commits
+            # The unseen list is a subset of the all-new list, so one pass over the all-new range covers both.
             if library.should_show_commit_details:
-                [c.populate_details(library.repo_url, self.run) for c in unseen_new_upstream_commits]
-                [c.populate_details(library.repo_url, self.run) for c in all_new_upstream_commits]
+                self._populate_commit_details(library.repo_url, common_ancestor, new_version, all_new_upstream_commits + unseen_new_upstream_commits)
 
         finally:
             # Step 8 Return us to the origin directory
@@ -229,6 +286,26 @@ class SCMProvider(BaseProvider, INeedsCommandProvider, INeedsLoggingProvider):
         # Populate them into a class but don't get details just yet.
         return [Commit(c) for c in commits if c]
 
+    def _populate_commit_details(self, repo, revision1, revision2, commits):
+        """
+        Populates the details of all the given commits, which must be in the range
+        rev1..rev2, with a single git command.
+        """
+        ret = self.run(["git", "log", "--no-merges", "--name-status", "--format=" + COMMIT_DETAILS_FORMAT, "%s..%s" % (revision1, revision2)])
+
+        details = {}
+        for record in ret.stdout.decode().split("\x1e")[1:]:
+            revision, summary, author, rest = record.split("\x1f", 3)
+            description, files_changed = rest.rsplit("\x1f", 1)
+            details[revision] = (summary, author, description, files_changed)
+
+        for c in commits:
+            if c.revision in details:
+                c.populate_details_from_log(repo, *details[c.revision])
+            else:
+                self.logger.log("Did not find details for %s in %s..%s, getting them individually." % (c.revision, revision1, revision2), level=LogLevel.Warning)
+                c.populate_details(repo, self.run)
+
     def _print_differing_commit_lists(self, list_a, list_a_name, list_b, list_b_name, problem):
         self.logger.log("%s." % problem, level=LogLevel.Error)
         self.logger.log("%s (%s)" % (list_a_name, len(list_a)), level=LogLevel.Error)
@@ -0,0 +1,107 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import re
+import time
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+class Timings:
+    """
+    Aggregates how long a run spends in each kind of operation. Every span has a
+    phase (e.g. 'http', 'db', 'subprocess', 'function', 'run') and a name within
+    that phase; we keep the count, total and maximum duration of each, and the
+    total per phase for each library. The library is tracked per thread, so the
+    prefetch workers attribute their time correctly.
+
+    Spans nest: a 'function' span from @logEntryExit includes the time of the
+    HTTP requests and queries made inside it, so the totals of different phases
+    overlap and should not be added together.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.start = time.time()
+            self.phases = {}
+            self.libraries = {}
+
+    @property
+    def library(self):
+        return getattr(self._local, 'library', None)
+
+    def set_library(self, library_name):
+        self._local.library = library_name
+
+    def clear_library(self):
+        self._local.library = None
+
+    @contextmanager
+    def span(self, phase, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, name, time.perf_counter() - start)
+
+    def record(self, phase, name, duration):
+        library = self.library
+        with self._lock:
+            stats = self.phases.setdefault(phase, {}).setdefault(name, {'count': 0, 'total': 0.0, 'max': 0.0})
+            stats['count'] += 1
+            stats['total'] += duration
+            stats['max'] = max(stats['max'], duration)
+
+            if library:
+                library_stats = self.libraries.setdefault(library, {})
+                library_stats[phase] = library_stats.get(phase, 0.0) + duration
+
+    def summary(self):
+        with self._lock:
+            return {
+                'total': round(time.time() - self.start, 3),
+                'phases': {
+                    phase: {
+                        name: {'count': s['count'], 'total': round(s['total'], 3), 'max': round(s['max'], 3)}
+                        for name, s in names.items()
+                    }
+                    for phase, names in self.phases.items()
+                },
+                'libraries': {
+                    library: {phase: round(total, 3) for phase, total in phases.items()}
+                    for library, phases in self.libraries.items()
+                }
+            }
+
+
+timings = Timings()
+
+
+def command_span_name(args):
+    # The program and its subcommand, e.g. 'git log' or './mach vendor'
+    if isinstance(args, str):
+        args = args.split()
+    return " ".join(str(a) for a in args[:2])
+
+
+def http_span_name(method, url):
+    # Leave out any path components with IDs or revisions in them, so that
+    # requests to the same endpoint are grouped together.
+    parsed = urlparse(url)
+    path = [p for p in parsed.path.split("/") if p and not re.search(r"\d", p)][:3]
+    return "%s %s/%s" % (method.upper(), parsed.netloc, "/".join(path))
+
+
+def query_span_name(query):
+    # The statement type and the table it operates on, e.g. 'SELECT jobs'
+    words = query.split()
+    verb = words[0].upper() if words else ""
+    table = re.search(r"\b(?:FROM|INTO|UPDATE|TABLE)\s+`?(\w+)", query, re.IGNORECASE)
+    return verb + (" " + table.group(1) if table else "")
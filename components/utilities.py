@@ -10,8 +10,11 @@ import pickle
 import functools
 import time
 
+import requests
 from dateutil.parser import parse
 
+from components.timing import timings, http_span_name
+
 RETRY_TIMES_OVERRIDE = None
 
 
@@ -93,6 +96,25 @@ def merge_dictionaries(a, b, ignored_dicts=[], ignored_keys=[]):
     return c
 
 
+# A requests.Session that records the time spent on each request in the timings
+class TimedSession(requests.Session):
+    def request(self, method, url, *args, **kwargs):
+        with timings.span("http", http_span_name(method, url)):
+            return super().request(method, url, *args, **kwargs)
+
+
+# Create a requests.Session whose connection pool keeps up to pool_size
+# keep-alive connections per host, so repeated API calls to the same
+# server reuse a connection instead of doing a new TCP+TLS handshake.
+def pooled_session(pool_size, headers={}):
+    session = TimedSession()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(headers)
+    return session
+
+
 # MemoizeImpl is a class that can memoize complex arguments using pickle
 # It is meant to be used on Class members and excludes the first (self) argument
 class MemoizeImpl:
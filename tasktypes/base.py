@@ -10,6 +10,15 @@ from components.logging import logEntryExit, LogLevel
 
 
 class BaseTaskRunner:
+    def prefetch(self, library, task):
+        """
+        Called (possibly concurrently with other libraries) before any task is processed
+        when Updatebot runs with more than one worker. A TaskRunner may override this to
+        perform network- or subprocess-bound work that does not touch the gecko working
+        copy, and use the results in process_task.
+        """
+        pass
+
     @logEntryExit
     def _should_process_new_job(self, library, task, new_version=None):
         def frequency_type():
@@ -4,10 +4,8 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
-import copy
-import functools
-
 from tasktypes.base import BaseTaskRunner
+from components.providerbase import CategoryLogger
 from components.dbmodels import JOBSTATUS, JOBOUTCOME, JOBTYPE
 from components.logging import LogLevel, logEntryExit
 from components.bugzilla import CommentTemplates
@@ -18,10 +16,14 @@ class CommitAlertTaskRunner(BaseTaskRunner):
     def __init__(self, provider_dictionary, config_dictionary):
         self.jobType = JOBTYPE.COMMITALERT
         self.__dict__.update(provider_dictionary)
-        self.logger = copy.deepcopy(self.loggingProvider)
-        self.logger.log = functools.partial(self.logger.log, category=self.__class__.mro()[0].__name__)
+        self.logger = CategoryLogger(self.loggingProvider, self.__class__.mro()[0].__name__)
         self.config = config_dictionary
 
+    # ====================================================================
+    def prefetch(self, library, task):
+        assert task.type == 'commit-alert'
+        self.scmProvider.prefetch(library.repo_url)
+
     # ====================================================================
     def process_task(self, library, task):
         assert task.type == 'commit-alert'
@@ -42,17 +44,23 @@ class CommitAlertTaskRunner(BaseTaskRunner):
         open_bugs = self.bugzillaProvider.find_open_bugs_info([j.bugzilla_id for j in all_library_jobs])
         jobs_with_open_bugs = [j for j in all_library_jobs if j.bugzilla_id in open_bugs]
         self.logger.log("We need to potentially update the FF version on %s open bugs." % len(open_bugs), level=LogLevel.Info)
+        # Bugs are updated in bulk, so group them by what we're setting
+        jobs_by_affected = {True: [], False: []}
         for j in jobs_with_open_bugs:
             self.logger.set_context(library.name, j.id)
             if my_ff_version not in j.ff_versions:
                 is_affected = _contains_commit(all_upstream_commits, j.version)
                 self.logger.log("Updating bug %s to set FF version %s as %s." % (
                     j.bugzilla_id, my_ff_version, "affected" if is_affected else "unaffected"), level=LogLevel.Info)
-                self.bugzillaProvider.mark_ff_version_affected(j.bugzilla_id, my_ff_version, affected=is_affected)
-                j.ff_versions.add(my_ff_version)
-                self.dbProvider.update_job_ff_versions(j, my_ff_version)
+                jobs_by_affected[is_affected].append(j)
         self.logger.set_context(library.name)
 
+        for is_affected, jobs in jobs_by_affected.items():
+            if not jobs:
+                continue
+            self.bugzillaProvider.mark_bugs_ff_version_affected([j.bugzilla_id for j in jobs], my_ff_version, affected=is_affected)
+            self.dbProvider.update_jobs_ff_versions(jobs, my_ff_version)
+
         # ==========================================================================================
         if not unseen_upstream_commits:
             self.logger.log("Okay, we didn't see any new upstream commits, so we're done here.", level=LogLevel.Info)
@@ -60,7 +68,7 @@ class CommitAlertTaskRunner(BaseTaskRunner):
 
         # ==========================================================================================
         newest_commit = unseen_upstream_commits[-1]
-        existing_job = self.dbProvider.get_job(library, newest_commit.revision)
+        existing_job = self.dbProvider.get_job(library, newest_commit.revision, self.jobType)
         if existing_job:
             self.logger.set_context(library.name, existing_job.id)
 
@@ -75,7 +83,6 @@ class CommitAlertTaskRunner(BaseTaskRunner):
             self.bugzillaProvider.mark_ff_version_affected(existing_job.bugzilla_id, my_ff_version)
 
             self.dbProvider.update_job_ff_versions(existing_job, my_ff_version)
-            existing_job.ff_versions.add(my_ff_version)
             return
 
         self.logger.log("Processing %s for %s upstream revisions culminating in %s." % (library.name, len(unseen_upstream_commits), newest_commit.revision), level=LogLevel.Info)
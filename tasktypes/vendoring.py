@@ -4,11 +4,10 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
-import copy
-import functools
 import subprocess
 
 from tasktypes.base import BaseTaskRunner
+from components.providerbase import CategoryLogger
 from apis.taskcluster import Classification
 from components.bugzilla import CommentTemplates
 from components.mach_vendor import VendorResult
@@ -21,9 +20,19 @@ class VendorTaskRunner(BaseTaskRunner):
     def __init__(self, provider_dictionary, config_dictionary):
         self.jobType = JOBTYPE.VENDORING
         self.__dict__.update(provider_dictionary)
-        self.logger = copy.deepcopy(self.loggingProvider)
-        self.logger.log = functools.partial(self.logger.log, category=self.__class__.mro()[0].__name__)
+        self.logger = CategoryLogger(self.loggingProvider, self.__class__.mro()[0].__name__)
         self.config = config_dictionary
+        self._prefetched_updates = {}
+
+    # ====================================================================
+    def prefetch(self, library, task):
+        assert task.type == 'vendoring'
+        self._prefetched_updates[library.yaml_path] = self.vendorProvider.check_for_update(library)
+
+    def _check_for_update(self, library):
+        if library.yaml_path in self._prefetched_updates:
+            return self._prefetched_updates.pop(library.yaml_path)
+        return self.vendorProvider.check_for_update(library)
 
     # ====================================================================
 
@@ -50,7 +59,7 @@ class VendorTaskRunner(BaseTaskRunner):
         self.logger.set_context(library.name)
 
         # See if we have a new upstream commit to process
-        new_version, timestamp = self.vendorProvider.check_for_update(library)
+        new_version, timestamp = self._check_for_update(library)
         if not new_version:
             self.logger.log("No new version for %s was found." % library.name, level=LogLevel.Info)
             return
@@ -287,7 +296,6 @@ class VendorTaskRunner(BaseTaskRunner):
             self.bugzillaProvider.mark_ff_version_affected(existing_job.bugzilla_id, my_ff_version, affected=True)
 
             self.dbProvider.update_job_ff_versions(existing_job, my_ff_version)
-            existing_job.ff_versions.add(my_ff_version)
             return
 
         elif existing_job.status == JOBSTATUS.AWAITING_INITIAL_PLATFORM_TRY_RESULTS:
@@ -316,11 +324,9 @@ class VendorTaskRunner(BaseTaskRunner):
         # Fetch the job list (and double check its status), and the push health
         job_list = []
         push_health = {}
-        for t in existing_job.try_runs:
-            this_job_list = self.taskclusterProvider.get_job_details(t.revision)
+        results_by_try_run = self.taskclusterProvider.get_job_details_and_push_health([t.revision for t in existing_job.try_runs])
+        for this_job_list, this_push_health in results_by_try_run:
             job_list = self.taskclusterProvider.combine_job_lists(job_list, this_job_list)
-
-            this_push_health = self.taskclusterProvider.get_push_health(t.revision)
             push_health = self.taskclusterProvider.combine_push_healths(push_health, this_push_health)
 
         if not self._job_is_completed_without_build_failures(library, existing_job, this_job_list):
@@ -329,10 +335,10 @@ class VendorTaskRunner(BaseTaskRunner):
         results = self.taskclusterProvider.determine_jobs_to_retrigger(push_health, job_list)
 
         def get_failed_summary_string(result_obj, include_task_ids):
-            fails_tuple = (len(result_obj.failed()), len(result_obj.all()))
-            if len(result_obj.all()) == 1:
+            fails_tuple = (result_obj.failed_count, result_obj.total_count)
+            if result_obj.total_count == 1:
                 result = "%s of %s failed" % fails_tuple
-            elif len(set([j.job_type_name for j in result_obj.all()])) != 1:
+            elif len(result_obj.job_type_names) != 1:
                 result = "%s of %s failed on different tasks" % fails_tuple
             else:
                 result = "%s of %s failed on the same (retriggered) task" % fails_tuple
@@ -350,6 +356,22 @@ class VendorTaskRunner(BaseTaskRunner):
 
         task_ids_weve_reported = set()
 
+        # Add the lines for the failed tests and then the failed jobs of one classification,
+        # skipping jobs whose failed tasks we've all reported already.
+        def add_classification_lines(lines, classification, include_test_summary):
+            for t, group in results['failed_tests_by_classification'][classification]:
+                lines.append("")
+                lines.append("- " + handle_multiline_name(t))
+                if include_test_summary and group.total_count > 1:
+                    lines.append("  - " + get_failed_summary_string(group, False))
+                for j in group.failed():
+                    task_ids_weve_reported.add(j.task_id)
+                    lines.append("\t\t- %s (%s)" % (j.job_type_name, j.task_id))
+
+            for t, group in results['failed_jobs_by_classification'][classification]:
+                if group.failed_task_ids() - task_ids_weve_reported:
+                    lines.append("- " + handle_multiline_name(t) + " - " + get_failed_summary_string(group, True))
+
         # The order in which we go through the results matter, and is tied to the priority we want to give to the classifications.
         # For example, if Push Health says something is a New Failure, but Taskcluster says it's NotYourFault.
         # Our Priority List is: NotYourFault, NewFailure, Possible Intermittent
@@ -364,65 +386,15 @@ class VendorTaskRunner(BaseTaskRunner):
 
         # Then Not Your Fault
         not_your_fault_lines = ["**Known Issues**:"]
-        for t in results['tasks_by_testname']:
-            if not results['tasks_by_testname'][t].failed():
-                continue
-            if results['tasks_by_testname'][t].classification == Classification.NotYourFault:
-                not_your_fault_lines.append("")
-                not_your_fault_lines.append("- " + handle_multiline_name(t))
-                for j in results['tasks_by_testname'][t].failed():
-                    task_ids_weve_reported.add(j.task_id)
-                    not_your_fault_lines.append("\t\t- %s (%s)" % (j.job_type_name, j.task_id))
-
-        for t in results['tasks_by_jobname']:
-            if not results['tasks_by_jobname'][t].failed():
-                continue
-            if results['tasks_by_jobname'][t].classification == Classification.NotYourFault:
-                if set([j.task_id for j in results['tasks_by_jobname'][t].failed()]) - task_ids_weve_reported:
-                    not_your_fault_lines.append("- " + handle_multiline_name(t) + " - " + get_failed_summary_string(results['tasks_by_jobname'][t], True))
+        add_classification_lines(not_your_fault_lines, Classification.NotYourFault, False)
 
         # Then New Failures
         high_priority_lines = ["**Needs Close Investigation**:"]
-        for t in results['tasks_by_testname']:
-            if not results['tasks_by_testname'][t].failed():
-                continue
-            if results['tasks_by_testname'][t].classification == Classification.NewFailure:
-                high_priority_lines.append("")
-                high_priority_lines.append("- " + handle_multiline_name(t))
-                if len(results['tasks_by_testname'][t].all()) > 1:
-                    high_priority_lines.append("  - " + get_failed_summary_string(results['tasks_by_testname'][t], False))
-                for j in results['tasks_by_testname'][t].failed():
-                    task_ids_weve_reported.add(j.task_id)
-                    high_priority_lines.append("\t\t- %s (%s)" % (j.job_type_name, j.task_id))
-
-        for t in results['tasks_by_jobname']:
-            if not results['tasks_by_jobname'][t].failed():
-                continue
-            if results['tasks_by_jobname'][t].classification == Classification.NewFailure:
-                # Only report this group if we haven't reported all the failed tasks already
-                if set([j.task_id for j in results['tasks_by_jobname'][t].failed()]) - task_ids_weve_reported:
-                    high_priority_lines.append("- " + handle_multiline_name(t) + " - " + get_failed_summary_string(results['tasks_by_jobname'][t], True))
+        add_classification_lines(high_priority_lines, Classification.NewFailure, True)
 
         # Finally intermittents
         intermittent_lines = ["**Needs Investigation (Possible Intermittents)**:"]
-        for t in results['tasks_by_testname']:
-            if not results['tasks_by_testname'][t].failed():
-                continue
-            if results['tasks_by_testname'][t].classification == Classification.PossibleIntermittent:
-                intermittent_lines.append("")
-                intermittent_lines.append("- " + handle_multiline_name(t))
-                if len(results['tasks_by_testname'][t].all()) > 1:
-                    intermittent_lines.append("  - " + get_failed_summary_string(results['tasks_by_testname'][t], False))
-                for j in results['tasks_by_testname'][t].failed():
-                    task_ids_weve_reported.add(j.task_id)
-                    intermittent_lines.append("\t\t- %s (%s)" % (j.job_type_name, j.task_id))
-
-        for t in results['tasks_by_jobname']:
-            if not results['tasks_by_jobname'][t].failed():
-                continue
-            if results['tasks_by_jobname'][t].classification == Classification.PossibleIntermittent:
-                if set([j.task_id for j in results['tasks_by_jobname'][t].failed()]) - task_ids_weve_reported:
-                    intermittent_lines.append("- " + handle_multiline_name(t) + " - " + get_failed_summary_string(results['tasks_by_jobname'][t], True))
+        add_classification_lines(intermittent_lines, Classification.PossibleIntermittent, True)
 
         comment_lines = list()
         comment_lines.extend((lint_lines + [""]) if len(lint_lines) > 1 else [])
@@ -21,7 +21,12 @@ TESTS = [
     "library",
     "lambda_capture",
     "class_passing",
-    "frequency"
+    "frequency",
+    "gitmirror",
+    "timing",
+    "diskcache",
+    "phabricator",
+    "logging_provider"
 ]
 
 modules = []
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+# These are not unit tests and are not run by test.py; run them by hand with
+#   python3 tests/benchmarks.py [name ...]
+# to see the effect of a change on the hot paths they cover.
+
+import os
+import sys
+import glob
+import time
+import argparse
+
+sys.path.append(".")
+sys.path.append("..")
+
+
+def timeit(func, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations
+
+
+def report(name, seconds, baseline=None):
+    line = "  %-40s %10.3f ms" % (name, seconds * 1000)
+    if baseline:
+        line += "  (%.1fx)" % (baseline / seconds)
+    print(line)
+
+
+# ==================================================================
+def benchmark_yaml(args):
+    import yaml
+    from components.libraryprovider import LibraryProvider, YamlLoader
+
+    file_prefix = "" if os.getcwd().endswith("tests") else "tests" + os.path.sep
+    corpus_paths = glob.glob(os.path.join(file_prefix + "..", ".github", "gecko-test", "*", "moz.yaml"))
+    if args.gecko_path:
+        corpus_paths += glob.glob(os.path.join(args.gecko_path, "**", "moz.yaml"), recursive=True)
+
+    corpus = []
+    for path in corpus_paths:
+        with open(path, "r") as f:
+            corpus.append(f.read())
+    print("Parsing %s moz.yaml files with %s" % (len(corpus), YamlLoader.__name__))
+
+    # Both loaders must give us exactly the same thing
+    for contents in corpus:
+        assert yaml.load(contents, Loader=yaml.BaseLoader) == yaml.load(contents, Loader=YamlLoader)
+
+    def parse_with(loader):
+        def parse():
+            for contents in corpus:
+                yaml.load(contents, Loader=loader)
+        return parse
+
+    def validate():
+        for contents in corpus:
+            try:
+                LibraryProvider.validate_library(contents, "fake/path")
+            except Exception:
+                pass
+
+    baseline = timeit(parse_with(yaml.BaseLoader), args.iterations)
+    report("yaml.load BaseLoader", baseline)
+    report("yaml.load " + YamlLoader.__name__, timeit(parse_with(YamlLoader), args.iterations), baseline)
+    report("LibraryProvider.validate_library", timeit(validate, args.iterations), baseline)
+
+
+# ==================================================================
+def benchmark_lifecycle(args):
+    import inspect
+    from automation import DEFAULT_OBJECTS
+    from components.providerbase import BaseProvider
+
+    # We measure only the cost of finding the methods to call, not of calling them
+    provider_classes = [c for c in DEFAULT_OBJECTS.values() if issubclass(c, BaseProvider)]
+    libraries = 200
+    print("initialize() and reset() on %s providers for %s library tasks" % (len(provider_classes), libraries))
+
+    def reflective_dispatch(cls, method):
+        found = []
+        classes = cls.mro()
+        classes.reverse()
+        for c in classes:
+            for m in inspect.getmembers(c, predicate=inspect.isfunction):
+                if m[0] == method:
+                    found.append(m[1])
+        return found
+
+    def cached_dispatch(cls, method):
+        return cls._dispatch_table[method]
+
+    def run_with(dispatch):
+        def run():
+            for i in range(libraries):
+                for method in ['_initialize', '_reset']:
+                    for cls in provider_classes:
+                        for f in dispatch(cls, method):
+                            pass
+        return run
+
+    for cls in provider_classes:
+        for method in BaseProvider.LIFECYCLE_METHODS:
+            assert reflective_dispatch(cls, method) == cached_dispatch(cls, method)
+
+    baseline = timeit(run_with(reflective_dispatch), args.iterations)
+    report("inspect.getmembers over the MRO", baseline)
+    report("per-class dispatch table", timeit(run_with(cached_dispatch), args.iterations), baseline)
+
+
+# ==================================================================
+def benchmark_pushhealth(args):
+    import json
+    from apis.taskcluster import TaskclusterProvider
+    from components.commandprovider import CommandProvider
+    from components.logging import LoggingProvider, LogLevel
+    from components.utilities import merge_dictionaries, PUSH_HEALTH_IGNORED_DICTS, PUSH_HEALTH_IGNORED_KEYS
+
+    file_prefix = "" if os.getcwd().endswith("tests") else "tests" + os.path.sep
+    corpus = []
+    for path in sorted(glob.glob(file_prefix + os.path.join("treeherder_api_responses", "health_*.txt"))):
+        with open(path, "r") as f:
+            corpus.append(f.read())
+    print("Combining %s recorded push health responses" % len(corpus))
+
+    quiet_config = {'LoggingProvider': LoggingProvider({'local': True, 'level': LogLevel.Fatal})}
+    commandProvider = CommandProvider({})
+    commandProvider.update_config(quiet_config)
+    provider = TaskclusterProvider({'url_treeherder': '', 'url_taskcluster': ''})
+    provider.update_config(dict(quiet_config, CommandProvider=commandProvider))
+
+    # Parsing is not what we're measuring, but both approaches need fresh
+    # documents each time because the combiner modifies its accumulator.
+    def parsed():
+        return [json.loads(c) for c in corpus]
+
+    def with_merge_dictionaries(documents):
+        combined = {}
+        for d in documents:
+            combined = merge_dictionaries(combined, d, ignored_dicts=PUSH_HEALTH_IGNORED_DICTS, ignored_keys=PUSH_HEALTH_IGNORED_KEYS)
+        return combined
+
+    def with_combiner(documents):
+        combined = {}
+        for d in documents:
+            combined = provider.combine_push_healths(combined, d)
+        return combined
+
+    # determine_jobs_to_retrigger must see the same failures, in the same order, either way
+    expected = with_merge_dictionaries(parsed())['metrics']['tests']['details']
+    actual = with_combiner(parsed())['metrics']['tests']['details']
+    for k in TaskclusterProvider.PUSH_HEALTH_DETAILS:
+        assert expected[k] == actual[k]
+
+    parse = timeit(parsed, args.iterations)
+    report("json.loads (included in both below)", parse)
+    baseline = timeit(lambda: with_merge_dictionaries(parsed()), args.iterations)
+    report("merge_dictionaries", baseline)
+    report("combine_push_healths", timeit(lambda: with_combiner(parsed()), args.iterations), baseline)
+
+
+# ==================================================================
+def benchmark_classification(args):
+    import json
+    from apis.taskcluster import TaskclusterProvider, Classification
+    from components.commandprovider import CommandProvider
+    from components.logging import LoggingProvider, LogLevel
+    from components.utilities import Struct
+    from tasktypes.vendoring import VendorTaskRunner
+    from tests.mock_treeherder_server import FAILURE_CLASSIFICATIONS
+
+    quiet_config = {'LoggingProvider': LoggingProvider({'local': True, 'level': LogLevel.Fatal})}
+    commandProvider = CommandProvider({})
+    commandProvider.update_config(quiet_config)
+    provider = TaskclusterProvider({'url_treeherder': '', 'url_taskcluster': ''})
+    provider.update_config(dict(quiet_config, CommandProvider=commandProvider))
+    provider.failure_classifications = {f['id']: f['name'] for f in json.loads(FAILURE_CLASSIFICATIONS)}
+
+    # Every recorded push we have both the jobs and the push health of
+    file_prefix = "" if os.getcwd().endswith("tests") else "tests" + os.path.sep
+    pushes = []
+    for health_path in sorted(glob.glob(file_prefix + os.path.join("treeherder_api_responses", "health_*.txt"))):
+        jobs_path = health_path.replace("health_", "jobs_")
+        if not os.path.exists(jobs_path):
+            continue
+        with open(jobs_path, "r") as f:
+            jobs = json.load(f)
+        with open(health_path, "r") as f:
+            health = json.load(f)
+        pushes.append((TaskclusterProvider._transform_job_list(jobs['job_property_names'], jobs['results']), health))
+    print("Classifying %s recorded pushes with %s jobs" % (len(pushes), sum(len(p[0]) for p in pushes)))
+
+    # _get_comments_on_push only needs these from the task runner
+    def runner_for(push):
+        taskclusterProvider = Struct(
+            get_job_details_and_push_health=lambda revisions: [push],
+            combine_job_lists=provider.combine_job_lists,
+            combine_push_healths=provider.combine_push_healths,
+            determine_jobs_to_retrigger=provider.determine_jobs_to_retrigger)
+        return Struct(logger=quiet_config['LoggingProvider'], taskclusterProvider=taskclusterProvider,
+                      _job_is_completed_without_build_failures=lambda *args: True)
+    existing_job = Struct(try_runs=[Struct(revision="recorded")])
+
+    def classify():
+        for (job_list, push_health) in pushes:
+            provider.determine_jobs_to_retrigger(push_health, job_list)
+
+    def comment():
+        for push in pushes:
+            VendorTaskRunner._get_comments_on_push(runner_for(push), None, existing_job)
+
+    # Finding the failed groups of each classification, as _get_comments_on_push used to
+    # (going through every group for each classification and listing its failed tasks)
+    # and by walking the buckets determine_jobs_to_retrigger now returns
+    all_results = [provider.determine_jobs_to_retrigger(push_health, job_list) for (job_list, push_health) in pushes]
+    order = [Classification.NotYourFault, Classification.NewFailure, Classification.PossibleIntermittent]
+
+    def full_scan():
+        found = []
+        for results in all_results:
+            for classification in order:
+                for groups in [results['tasks_by_testname'], results['tasks_by_jobname']]:
+                    for name, group in groups.items():
+                        failed = [t for t in group.all() if t.failed]
+                        if not failed:
+                            continue
+                        if group.classification == classification:
+                            found.append((name, set([t.task_id for t in failed])))
+        return found
+
+    def bucketed():
+        found = []
+        for results in all_results:
+            for classification in order:
+                for buckets in [results['failed_tests_by_classification'], results['failed_jobs_by_classification']]:
+                    for name, group in buckets.get(classification, []):
+                        found.append((name, set(group.failed_task_ids())))
+        return found
+
+    assert full_scan() == bucketed()
+
+    report("determine_jobs_to_retrigger", timeit(classify, args.iterations))
+    baseline = timeit(full_scan, args.iterations)
+    report("failed groups by scanning every group", baseline)
+    report("failed groups by classification bucket", timeit(bucketed, args.iterations), baseline)
+    report("_get_comments_on_push", timeit(comment, args.iterations))
+
+
+# ==================================================================
+BENCHMARKS = {
+    'yaml': benchmark_yaml,
+    'lifecycle': benchmark_lifecycle,
+    'pushhealth': benchmark_pushhealth,
+    'classification': benchmark_classification,
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('benchmarks', nargs='*', help="The benchmarks to run, from: %s (default: all)" % ", ".join(BENCHMARKS.keys()))
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--gecko-path', help="A mozilla-central checkout to take additional input from")
+    args = parser.parse_args()
+    for b in args.benchmarks:
+        if b not in BENCHMARKS:
+            parser.error("Unknown benchmark '%s'" % b)
+
+    for b in args.benchmarks or BENCHMARKS.keys():
+        print(b)
+        BENCHMARKS[b](args)
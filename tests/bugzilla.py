@@ -6,7 +6,10 @@
 
 import re
 import sys
+import shutil
+import tempfile
 import unittest
+from urllib.parse import urlparse, parse_qs
 
 from threading import Thread
 from http import server
@@ -18,13 +21,16 @@ from components.utilities import Struct, string_date_to_uniform_string_date
 from components.bugzilla import BugzillaProvider, CommentTemplates
 from components.logging import SimpleLoggerConfig
 
-from apis.bugzilla_api import task_id_whiteboard
+from apis.bugzilla_api import task_id_whiteboard, chunkBugIDs
 
 TRY_REVISION = "this-is-my-try-link"
 
 
 class MockBugzillaServer(server.BaseHTTPRequestHandler):
     closed_bug_ids = []
+    incremental_comments = []
+    incremental_comment_requests = []
+    open_bugs_requests = []
 
     def do_POST(self):
         expectedPath_file = "/bug?api_key=bob"
@@ -75,6 +81,7 @@ class MockBugzillaServer(server.BaseHTTPRequestHandler):
         self.end_headers()
 
         if expectedPath_find in self.path:
+            MockBugzillaServer.open_bugs_requests.append(self.path)
             self.wfile.write('{"bugs":[{"id":2,"assigned_to_detail":{"id":578488,"email":"tom@mozilla.com","real_name":"Tom Ritter [:tjr]","name":"tom@mozilla.com","nick":"tjr"},"assigned_to":"tom@mozilla.com"}],"faults":[]}'.encode())
         elif expectedPath_comments_autoland == self.path:
             self.wfile.write('{"bugs":{"7892":{"comments":[{"text":"landing: https://hg.mozilla.org/integration/autoland/rev/abc123"}]}}}'.encode())
@@ -82,6 +89,13 @@ class MockBugzillaServer(server.BaseHTTPRequestHandler):
             self.wfile.write('{"bugs":{"7893":{"comments":[{"text":"landing: https://github.com/mozilla-firefox/firefox/commit/abc123"}]}}}'.encode())
         elif expectedPath_comments_mozilla_central == self.path:
             self.wfile.write('{"bugs":{"7894":{"comments":[{"text":"landing: https://hg.mozilla.org/mozilla-central/rev/abc123"}]}}}'.encode())
+        elif self.path.startswith("/bug/7895/comment"):
+            MockBugzillaServer.incremental_comment_requests.append(self.path)
+            comments = MockBugzillaServer.incremental_comments
+            new_since = parse_qs(urlparse(self.path).query).get('new_since', None)
+            if new_since:
+                comments = [c for c in comments if c['creation_time'] > new_since[0]]
+            self.wfile.write(json.dumps({"bugs": {"7895": {"comments": comments}}}).encode())
         elif "/comment" in self.path:
             self.wfile.write('{"bugs":{"7891":{"comments":[{"text":"no autoland links here"}]}}}'.encode())
         else:
@@ -91,6 +105,7 @@ class MockBugzillaServer(server.BaseHTTPRequestHandler):
         expectedPath_comment = "/bug/123"
         expectedPath_status = "/bug/456?api_key=bob"
         expectedPath_close = "/bug/789"
+        expectedPath_bulk_status = "/bug/501?api_key=bob"
         size = int(self.headers.get('content-length'))
         content = json.loads(self.rfile.read(size).decode("utf-8"))
         bug_id = re.match(r"/bug/([0-9]+)\?api_key=bob", self.path).groups(0)[0]
@@ -125,6 +140,11 @@ class MockBugzillaServer(server.BaseHTTPRequestHandler):
             assert content['cf_status_firefox76'] == 'affected'
 
             self.wfile.write("{'bugs':[{'alias':null,'changes':{},'last_change_time':'2020-07-10T18:58:21Z','id':456}]}".replace("'", '"').encode())
+        elif expectedPath_bulk_status == self.path:
+            assert content['ids'] == [501, 502, 503]
+            assert content['cf_status_firefox76'] == 'unaffected'
+
+            self.wfile.write(json.dumps({'bugs': [{'id': i, 'changes': {}} for i in content['ids']]}).encode())
         elif expectedPath_close in self.path:
             MockBugzillaServer.closed_bug_ids.append(int(bug_id))
             assert 'id' in content
@@ -196,10 +216,36 @@ class TestBugzillaProvider(unittest.TestCase):
 
     def testStatus(self):
         self.bugzillaProvider.mark_ff_version_affected(456, 76)
+        self.bugzillaProvider.mark_bugs_ff_version_affected([501, 502, 503], 76, affected=False)
 
     def testGet(self):
         self.assertEqual({2: {'id': 2, "assigned_to_detail": {"id": 578488, "email": "tom@mozilla.com", "real_name": "Tom Ritter [:tjr]", "name": "tom@mozilla.com", "nick": "tjr"}, "assigned_to": "tom@mozilla.com"}}, self.bugzillaProvider.find_open_bugs_info([1, 2, 3]))
 
+    def testOpenBugsPrefetch(self):
+        self.assertEqual([[1, 22], [333], [4444]], list(chunkBugIDs([1, 22, 333, 4444], max_length=7)))
+
+        bugzillaProvider = BugzillaProvider({
+            'General': {'env': 'dev', 'ff-version': 88},
+            'apikey': 'bob',
+            'url': 'http://localhost:27489/',
+        })
+        bugzillaProvider.update_config(SimpleLoggerConfig)
+        requests = MockBugzillaServer.open_bugs_requests
+
+        num_requests = len(requests)
+        bugzillaProvider.prefetch_open_bugs([3, 1, 2, None])
+        self.assertEqual(len(requests), num_requests + 1)
+        self.assertIn("&id=1,2,3&", requests[-1])
+
+        # Answered from what we prefetched
+        self.assertEqual([2], list(bugzillaProvider.find_open_bugs_info([1, 2])))
+        self.assertEqual(len(requests), num_requests + 1)
+
+        # Only bugs we haven't seen are requested
+        bugzillaProvider.find_open_bugs_info([2, 4])
+        self.assertEqual(len(requests), num_requests + 2)
+        self.assertIn("&id=4&", requests[-1])
+
     def testClose(self):
         self.bugzillaProvider.wontfix_bug(7890, "Hello World")
         self.bugzillaProvider.dupe_bug(7891, "Hello Earth", 12345)
@@ -211,6 +257,42 @@ class TestBugzillaProvider(unittest.TestCase):
         self.assertTrue(self.bugzillaProvider.bug_has_landing_link(7894))
         self.assertFalse(self.bugzillaProvider.bug_has_landing_link(7891))
 
+    def testHasLandingLinkIncremental(self):
+        requests = MockBugzillaServer.incremental_comment_requests
+        MockBugzillaServer.incremental_comments = [
+            {"id": 10, "creation_time": "2023-01-01T00:00:00Z", "text": "Update dav1d"}
+        ]
+        cache_dir = tempfile.mkdtemp()
+
+        def provider():
+            p = BugzillaProvider({
+                'General': {'env': 'dev', 'ff-version': 88},
+                'apikey': 'bob',
+                'url': 'http://localhost:27489/',
+                'comment_cache_path': cache_dir,
+            })
+            p.update_config(SimpleLoggerConfig)
+            return p
+
+        try:
+            bugzillaProvider = provider()
+            self.assertFalse(bugzillaProvider.bug_has_landing_link(7895))
+            self.assertEqual(requests[-1], "/bug/7895/comment")
+
+            # Only the comments since the last one we saw are requested
+            MockBugzillaServer.incremental_comments.append(
+                {"id": 11, "creation_time": "2023-01-02T00:00:00Z", "text": "landing: https://hg.mozilla.org/mozilla-central/rev/abc123"})
+            self.assertTrue(bugzillaProvider.bug_has_landing_link(7895))
+            self.assertEqual(requests[-1], "/bug/7895/comment?new_since=2022-12-31T23%3A59%3A59Z")
+
+            # Once found, a landing link is remembered, including by later runs
+            num_requests = len(requests)
+            self.assertTrue(bugzillaProvider.bug_has_landing_link(7895))
+            self.assertTrue(provider().bug_has_landing_link(7895))
+            self.assertEqual(len(requests), num_requests)
+        finally:
+            shutil.rmtree(cache_dir)
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=0)
@@ -79,6 +79,97 @@ class TestDatabaeQueries(unittest.TestCase):
         finally:
             self.db.delete_job(job_id=newJob.id)
 
+    def testJobsForLibrary(self):
+        library = Struct(**{
+            'name': 'test_library_filter',
+            'yaml_path': 'path/to/moz.yaml',
+        })
+
+        try:
+            self.db.create_job(JOBTYPE.VENDORING, library, "v1",
+                               JOBSTATUS.DONE, JOBOUTCOME.ALL_SUCCESS, 1)
+            self.db.create_job(JOBTYPE.COMMITALERT, library, "v2",
+                               JOBSTATUS.DONE, JOBOUTCOME.ALL_SUCCESS, 2)
+
+            vendoring = self.db.get_all_jobs_for_library(library, JOBTYPE.VENDORING)
+            self.assertEqual([j.version for j in vendoring], ["v1"])
+            commitalert = self.db.get_all_jobs_for_library(library, JOBTYPE.COMMITALERT)
+            self.assertEqual([j.version for j in commitalert], ["v2"])
+
+            self.assertEqual(sorted(self.db.get_bug_ids_for_libraries([(library, JOBTYPE.VENDORING), (library, JOBTYPE.COMMITALERT)])), [1, 2])
+            self.assertEqual(self.db.get_bug_ids_for_libraries([(library, JOBTYPE.COMMITALERT)]), [2])
+            self.assertEqual(self.db.get_bug_ids_for_libraries([]), [])
+
+            self.assertEqual(len(self.db.get_all_jobs_for_library_by_name("library_filt")), 2)
+            self.assertEqual(len(self.db.get_all_jobs_for_library_by_name("library%filter")), 0)
+            # The match is case-sensitive
+            self.assertEqual(len(self.db.get_all_jobs_for_library_by_name("Library_Filt")), 0)
+            self.assertEqual(len(self.db.get_all_jobs_for_library_by_name("LIBRARY_FILTER")), 0)
+        finally:
+            self.db.delete_job(library=library, version="v1")
+            self.db.delete_job(library=library, version="v2")
+
+    def testJobsCache(self):
+        library = Struct(**{
+            'name': 'test_library_cache',
+            'yaml_path': 'path/to/moz.yaml',
+        })
+
+        try:
+            self.assertEqual([], self.db.get_all_jobs_for_library(library, JOBTYPE.VENDORING))
+
+            # Writes are reflected in the cached job list without a reset
+            first = self.db.create_job(JOBTYPE.VENDORING, library, "v1",
+                                       JOBSTATUS.CREATED, JOBOUTCOME.PENDING)
+            second = self.db.create_job(JOBTYPE.VENDORING, library, "v2",
+                                        JOBSTATUS.CREATED, JOBOUTCOME.PENDING)
+            self.db.add_try_run(second, "abcdef", "initial platform")
+
+            cached = self.db.get_all_jobs_for_library(library, JOBTYPE.VENDORING)
+            self.assertEqual([j.version for j in cached], ["v2", "v1"])
+            self.assertEqual(cached[0].prior_job, first)
+            self.assertTrue(self.db.get_job(library, "v1", JOBTYPE.VENDORING) is first)
+
+            # A job of another type with the same version isn't mistaken for it
+            self.assertEqual(None, self.db.get_job(library, "v1", JOBTYPE.COMMITALERT))
+            self.assertEqual(self.db.get_job(library, "v1").id, first.id)
+
+            # Nothing cached is kept into the next task, even if this one didn't reset
+            self.db.initialize()
+            self.assertEqual(self.db._jobs_cache, {})
+
+            # And match what we get from the database after one
+            self.db.reset()
+            reloaded = self.db.get_all_jobs_for_library(library, JOBTYPE.VENDORING)
+            self.assertEqual([j.version for j in reloaded], ["v2", "v1"])
+            self.assertEqual(reloaded[0].get_try_run_ids(), "abcdef")
+        finally:
+            self.db.delete_job(library=library, version="v1")
+            self.db.delete_job(library=library, version="v2")
+
+    def testBulkFFVersions(self):
+        library = Struct(**{
+            'name': 'test_library_ff_versions',
+            'yaml_path': 'path/to/moz.yaml',
+        })
+
+        try:
+            self.db.create_job(JOBTYPE.COMMITALERT, library, "v1",
+                               JOBSTATUS.DONE, JOBOUTCOME.ALL_SUCCESS, 1)
+            self.db.create_job(JOBTYPE.COMMITALERT, library, "v2",
+                               JOBSTATUS.DONE, JOBOUTCOME.ALL_SUCCESS, 2)
+            jobs = self.db.get_all_jobs_for_library(library, JOBTYPE.COMMITALERT)
+
+            self.db.update_jobs_ff_versions(jobs, 90)
+            self.assertTrue(all(90 in j.ff_versions for j in jobs))
+
+            self.db.reset()
+            reloaded = self.db.get_all_jobs_for_library(library, JOBTYPE.COMMITALERT)
+            self.assertTrue(all(90 in j.ff_versions for j in reloaded))
+        finally:
+            self.db.delete_job(library=library, version="v1")
+            self.db.delete_job(library=library, version="v2")
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=0)
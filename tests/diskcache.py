@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.append(".")
+sys.path.append("..")
+from components.diskcache import DiskCache
+
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def testGetAndSet(self):
+        cache = DiskCache(self.cache_dir, 1024 * 1024)
+        self.assertEqual(cache.get("https://example.com/a"), None)
+
+        cache.set("https://example.com/a", {'results': [1, 2, 3]})
+        cache.set("https://example.com/b", "b", ttl=-1)
+        self.assertEqual(cache.get("https://example.com/a"), {'results': [1, 2, 3]})
+        # Expired entries are not returned, and are removed
+        self.assertEqual(cache.get("https://example.com/b"), None)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+        # A new cache object (i.e. a new run) sees the same entries
+        self.assertEqual(DiskCache(self.cache_dir, 1024 * 1024).get("https://example.com/a"), {'results': [1, 2, 3]})
+
+        cache.delete("https://example.com/a")
+        self.assertEqual(cache.get("https://example.com/a"), None)
+
+    def testEviction(self):
+        cache = DiskCache(self.cache_dir, 1024 * 1024)
+        cache.set("old", "x" * 1000)
+        cache.set("new", "x" * 1000)
+        os.utime(cache._entry_path("old"), (0, 0))
+
+        cache.max_size = 1500
+        cache.evict()
+        self.assertEqual(cache.get("old"), None)
+        self.assertEqual(cache.get("new"), "x" * 1000)
+
+    def testEvictionOnlyWhenFull(self):
+        cache = DiskCache(self.cache_dir, 5000)
+        evictions = []
+        original = cache.evict
+
+        def evict():
+            evictions.append(len(os.listdir(self.cache_dir)))
+            original()
+        cache.evict = evict
+
+        # We only need to look at the directory to learn its size once
+        for i in range(4):
+            cache.set("entry %s" % i, "x" * 1000)
+        cache.set("entry 0", "y" * 1000)
+        cache.delete("entry 1")
+        self.assertEqual(evictions, [1])
+
+        # Until our writes take it beyond max_size
+        os.utime(cache._entry_path("entry 2"), (0, 0))
+        cache.set("entry 4", "x" * 2500)
+        self.assertEqual(evictions, [1, 4])
+        self.assertEqual(cache.get("entry 2"), None)
+        self.assertEqual(cache.get("entry 4"), "x" * 2500)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=0)
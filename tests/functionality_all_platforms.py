@@ -32,9 +32,10 @@ from components.scmprovider import SCMProvider
 from apis.taskcluster import TaskclusterProvider
 from apis.phabricator import PhabricatorProvider
 
-from tests.functionality_utilities import SHARED_COMMAND_MAPPINGS, TRY_OUTPUT, TRY_LOCKED_OUTPUT, ARC_OUTPUT, CONDUIT_EDIT_OUTPUT, MockedBugzillaProvider, treeherder_response
+from tests.functionality_utilities import SHARED_COMMAND_MAPPINGS, SHARED_CONDUIT_MAPPINGS, TRY_OUTPUT, TRY_LOCKED_OUTPUT, ARC_OUTPUT, CONDUIT_EDIT_OUTPUT, MockedBugzillaProvider, treeherder_response
 from tests.mock_commandprovider import TestCommandProvider
 from tests.mock_libraryprovider import MockLibraryProvider
+from tests.mock_conduit_server import MockConduitServerFactory, CONDUIT_PORT, CONDUIT_URL
 from tests.mock_treeherder_server import MockTreeherderServerFactory, TYPE_HEALTH
 from tests.database import transform_db_config_to_tmp_db
 
@@ -104,6 +105,9 @@ class TestFunctionality(SimpleLoggingTest):
         self.server = server.HTTPServer(('', 27490), MockTreeherderServerFactory(treeherder_response))
         t = Thread(target=self.server.serve_forever)
         t.start()
+        self.conduit_server = server.HTTPServer(('', CONDUIT_PORT), MockConduitServerFactory(SHARED_CONDUIT_MAPPINGS(command_callbacks)))
+        t = Thread(target=self.conduit_server.serve_forever)
+        t.start()
 
         db_config = transform_db_config_to_tmp_db(localconfig['Database'])
         db_config['keep_tmp_db'] = keep_tmp_db
@@ -131,7 +135,10 @@ class TestFunctionality(SimpleLoggingTest):
                 'url_treeherder': 'http://localhost:27490/',
                 'url_taskcluster': 'http://localhost:27490/',
             },
-            'Phabricator': {},
+            'Phabricator': {
+                'url': CONDUIT_URL,
+                'apikey': 'api-token'
+            },
             'Library': {
                 'vendoring_revision_override': "_current",
             }
@@ -157,6 +164,8 @@ class TestFunctionality(SimpleLoggingTest):
     def _cleanup(self, u, expected_values):
         self.server.shutdown()
         self.server.server_close()
+        self.conduit_server.shutdown()
+        self.conduit_server.server_close()
         for lib in u.libraryProvider.get_libraries(u.config_dictionary['General']['gecko-path']):
             for task in lib.tasks:
                 if task.type != 'vendoring':
@@ -104,12 +104,19 @@ class MockedBugzillaProvider(BaseProvider):
     def dupe_bug(self, bug_id, comment, dup_id):
         pass
 
+    def prefetch_open_bugs(self, bug_ids):
+        pass
+
     def find_open_bugs_info(self, bug_ids):
         return self._filed_bug_ids_func(ONLY_OPEN)
 
     def mark_ff_version_affected(self, bug_id, ff_version, affected):
         self._assert_affected_func(bug_id, ff_version, affected)
 
+    def mark_bugs_ff_version_affected(self, bug_ids, ff_version, affected):
+        for bug_id in bug_ids:
+            self._assert_affected_func(bug_id, ff_version, affected)
+
     def bug_has_landing_link(self, bug_id):
         return False
 
@@ -4,7 +4,7 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
-import platform
+import json
 from functools import wraps
 from collections import OrderedDict
 
@@ -14,6 +14,7 @@ from components.logging import logEntryExit
 from components.providerbase import INeedsLoggingProvider
 
 from tests.mock_treeherder_server import TYPE_HEALTH, TYPE_JOBS
+from tests.mock_conduit_server import CONDUIT_URL
 
 
 """
@@ -29,7 +30,7 @@ try_submit      ./mach try
 Required Callbacks
     If these commands are run, callbacks must be supplied or it will cause errors.
 
-abandon         echo {\"transactions\": [{\"type\":\"abandon\"")
+abandon         differential.revision.edit with an abandon transaction (see MockConduitServerFactory)
 patch           ./mach vendor --patch-mode only
 
 
@@ -45,10 +46,6 @@ returncode os 0 is used.
 
 
 def SHARED_COMMAND_MAPPINGS(expected_values, command_callbacks):
-    def echo_str(s):
-        if platform.system() != "Windows":
-            return s.replace("echo {", "echo '{")
-
     global phab_calls
     phab_calls = -1
 
@@ -78,15 +75,11 @@ def SHARED_COMMAND_MAPPINGS(expected_values, command_callbacks):
         ("hg diff --stat", lambda: " accessible/interfaces/ia2/moz.build |  6 +++---\n 1 files changed, 3 insertions(+), 3 deletions(-)\n"),
         ("arc diff --verbatim", command_callbacks.get('phab_submit', default_phab_submit)),
         ("arcanist diff --verbatim", command_callbacks.get('phab_submit', default_phab_submit)),
-        (echo_str("echo {\"constraints\""), lambda: CONDUIT_USERNAME_SEARCH_OUTPUT),  # This is also used for differential.revision.search, that's alright
-        (echo_str("echo {\"transactions\": [{\"type\":\"reviewers.set\""), lambda: CONDUIT_EDIT_OUTPUT),
-        (echo_str("echo {\"transactions\": [{\"type\":\"abandon\""), command_callbacks.get('abandon', AssertFalse)),
-        (echo_str("echo {\"transactions\": [{\"type\":\"bugzilla.bug-id\""), lambda: CONDUIT_EDIT_OUTPUT),
-        (echo_str("echo {\"transactions\": [{\"type\":\"parents.add\""), lambda: CONDUIT_EDIT_OUTPUT),
         ("git log -1 --oneline", lambda: "0481f1c (HEAD -> issue-115-add-revision-to-log, origin/issue-115-add-revision-to-log) Issue #115 - Add revision of updatebot to log output"),
         ("git clone https://example.invalid .", lambda: ""),
         ("git merge-base", lambda: "_current"),
         ("git log --pretty=%H|%ai|%ci", lambda cmd: "\n".join(expected_values.git_pretty_output_func("_current" not in cmd))),
+        ("git log --no-merges --name-status", lambda cmd: GIT_LOG_DETAILS_OUTPUT(expected_values.git_pretty_output_func("_current" not in cmd))),
         ("git diff --name-status", lambda: GIT_DIFF_FILES_CHANGES),
         ("git log --pretty=%s", lambda: "Roll SPIRV-Tools from a61d07a72763 to 1cda495274bb (1 revision)"),
         ("git log --pretty=%an", lambda: "Tom Ritter"),
@@ -94,6 +87,16 @@ def SHARED_COMMAND_MAPPINGS(expected_values, command_callbacks):
     ])
 
 
+def SHARED_CONDUIT_MAPPINGS(command_callbacks):
+    return OrderedDict([
+        ("user.search", lambda: CONDUIT_USERNAME_SEARCH_OUTPUT),
+        ("project.search", lambda: CONDUIT_USERNAME_SEARCH_OUTPUT),
+        ("differential.revision.search", CONDUIT_REVISION_SEARCH_OUTPUT),
+        ("differential.revision.edit:abandon", command_callbacks.get('abandon', AssertFalse)),
+        ("differential.revision.edit", lambda: CONDUIT_EDIT_OUTPUT),
+    ])
+
+
 def TRY_OUTPUT(revision, include_auto_line=True):
     s = ""
     if include_auto_line:
@@ -160,15 +163,21 @@ rebasing 539628:2f4625139f7e "Bug 1652037 - Wire up build_clang_tidy_external in
 
 Completed
 (D%s) 539629:94adaadd8131 Bug 1652039 - Include checks in subdirectories in MozillaTidyModule.cpp r?andi
--> https://phabricator-dev.allizom.org/D%s
+-> """ + CONDUIT_URL + """D%s
 """
 
-# This is also used for differential.revision.search, that's alright, because it returns a PHID
-# even if it's not the right type of PHID.
 CONDUIT_USERNAME_SEARCH_OUTPUT = """
 {"error":null,"errorMessage":null,"response":{"data":[{"id":154,"type":"USER","phid":"PHID-USER-dd6rge2k2csia46r2wcw","fields":{"username":"tjr","realName":"Tom Ritter","roles":["verified","approved","activated"],"dateCreated":1519415695,"dateModified":1519416233,"policy":{"view":"public","edit":"no-one"}},"attachments":[]}],"maps":[],"query":{"queryKey":null},"cursor":{"limit":100,"after":null,"before":null,"order":null}}}
 """
 
+
+def CONDUIT_REVISION_SEARCH_OUTPUT(params):
+    ids = json.loads(params)['constraints']['ids']
+    return json.dumps({"error": None, "errorMessage": None, "response": {"data": [
+        {"id": i, "type": "DREV", "phid": "PHID-DREV-%s" % i} for i in ids
+    ]}})
+
+
 CONDUIT_EDIT_OUTPUT = """
 {"error":null,"errorMessage":null,"response":{"object":{"id":3643,"phid":"PHID-DREV-4pi6s6fwd57bktfzvfns"},"transactions":[{"phid":"PHID-XACT-DREV-om5mlg2ib34yaoi"},{"phid":"PHID-XACT-DREV-2pzq4qktezb7qqc"}]}}
 """
@@ -201,6 +210,18 @@ Commit-Queue: Jamie Madill <jmadill@chromium.org>
 """
 
 
+def GIT_LOG_DETAILS_OUTPUT(git_pretty_output):
+    s = ""
+    for line in git_pretty_output:
+        s += "\x1e%s\x1f%s\x1f%s\x1f%s\x1f\n%s" % (
+            line.split("|")[0],
+            "Roll SPIRV-Tools from a61d07a72763 to 1cda495274bb (1 revision)",
+            "Tom Ritter",
+            GIT_COMMIT_BODY,
+            GIT_DIFF_FILES_CHANGES)
+    return s
+
+
 ALL_BUGS = False
 ONLY_OPEN = True
 
@@ -253,6 +274,10 @@ class MockedBugzillaProvider(BaseProvider, INeedsLoggingProvider):
             "We expected to mark %s as a dupe of %s as a dupe, but we actually marked it a dupe of %s" % (
                 bug_id, self._get_filed_bug_id_func(), dup_id)
 
+    @logEntryExit
+    def prefetch_open_bugs(self, bug_ids):
+        pass
+
     @logEntryExit
     def find_open_bugs_info(self, bug_ids):
         return self._filed_bug_ids_func(ONLY_OPEN)
@@ -261,6 +286,11 @@ class MockedBugzillaProvider(BaseProvider, INeedsLoggingProvider):
     def mark_ff_version_affected(self, bug_id, ff_version, affected):
         self._assert_affected_func(bug_id, ff_version, affected)
 
+    @logEntryExit
+    def mark_bugs_ff_version_affected(self, bug_ids, ff_version, affected):
+        for bug_id in bug_ids:
+            self._assert_affected_func(bug_id, ff_version, affected)
+
     @logEntryExit
     def bug_has_landing_link(self, bug_id):
         return False
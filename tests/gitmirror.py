@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.append(".")
+sys.path.append("..")
+from components.gitmirror import GitMirrorCache, MirrorLock
+from components.scmprovider import SCMProvider
+from components.commandprovider import CommandProvider
+from components.logging import SimpleLogger, SimpleLoggerConfig
+
+from tests.mock_repository import default_test_repo, test_repo_path_wrapper, COMMITS_BRANCH2
+
+
+@unittest.skipIf(not GitMirrorCache.is_supported(), "Mirror caches are not supported on this platform")
+class TestGitMirrorCache(unittest.TestCase):
+    def setUp(self):
+        self.runner = CommandProvider({})
+        self.runner.update_config(SimpleLoggerConfig)
+
+        self.commands = []
+
+        def _run(args, **kwargs):
+            self.commands.append(args)
+            return self.runner.run(args, **kwargs)
+
+        self.cache_dir = tempfile.mkdtemp()
+        self.checkout_dir = tempfile.mkdtemp()
+        self.cache = GitMirrorCache(self.cache_dir, 1024 * 1024 * 1024, _run, SimpleLogger())
+        self.repo_url = test_repo_path_wrapper(default_test_repo())
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        shutil.rmtree(self.checkout_dir, ignore_errors=True)
+
+    def _git_commands(self, subcommand):
+        return [c for c in self.commands if subcommand in c]
+
+    def testCreateAndReuse(self):
+        mirror = self.cache.refresh(self.repo_url)
+        self.assertTrue(os.path.isdir(mirror))
+        self.assertEqual(len(self._git_commands("--mirror")), 1)
+
+        # We only fetch once per process
+        self.assertEqual(mirror, self.cache.refresh(self.repo_url))
+        self.assertEqual(len(self._git_commands("fetch")), 0)
+
+        # A new cache object (i.e. a new run) reuses the mirror with an incremental fetch
+        self.cache._refreshed.clear()
+        self.cache.refresh(self.repo_url)
+        self.assertEqual(len(self._git_commands("--mirror")), 1)
+        self.assertEqual(len(self._git_commands("fetch")), 1)
+
+    def testCheckout(self):
+        lock = self.cache.checkout(self.repo_url, self.checkout_dir)
+        try:
+            head = self.runner.run(["git", "-C", self.checkout_dir, "rev-parse", "HEAD"]).stdout.decode().strip()
+            self.assertEqual(head, COMMITS_BRANCH2[0])
+            self.assertTrue(os.path.exists(os.path.join(self.checkout_dir, ".git", "objects", "info", "alternates")))
+        finally:
+            lock.release()
+
+    def testEviction(self):
+        other_url = test_repo_path_wrapper("test-repo-870617305a0d3441eab0828965d138be7c99d1bc.bundle")
+
+        old_mirror = self.cache.refresh(other_url)
+        os.utime(old_mirror, (0, 0))
+
+        # An in-use mirror is never evicted
+        lock = self.cache.checkout(other_url, self.checkout_dir)
+        os.utime(old_mirror, (0, 0))
+        self.cache.max_size = 0
+        new_mirror = self.cache.refresh(self.repo_url)
+        self.assertTrue(os.path.isdir(old_mirror))
+        self.assertTrue(os.path.isdir(new_mirror))
+        lock.release()
+
+        # But once released the least recently used one is, and the one we're using is kept
+        self.cache.evict(keep=new_mirror)
+        self.assertFalse(os.path.isdir(old_mirror))
+        self.assertTrue(os.path.isdir(new_mirror))
+
+    def testLockReleasedAfterFailedTask(self):
+        scmProvider = SCMProvider({'mirror_cache_path': self.cache_dir})
+        scmProvider.update_config(dict(SimpleLoggerConfig, CommandProvider=self.runner))
+
+        cwd = os.getcwd()
+        try:
+            scmProvider.initialize()
+            scmProvider._ensure_checkout(self.repo_url)
+        finally:
+            os.chdir(cwd)
+        lock_path = self.cache._lock_path(self.cache.mirror_path(self.repo_url))
+        self.assertFalse(MirrorLock(lock_path, blocking=False).acquire())
+
+        # The task raised, so reset() was never called; the next task's initialize() releases the lock
+        scmProvider.initialize()
+        lock = MirrorLock(lock_path, blocking=False)
+        self.assertTrue(lock.acquire())
+        lock.release()
+        scmProvider.reset()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=0)
@@ -5,12 +5,15 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 import sys
+import shutil
+import tempfile
 import unittest
 import os
 
 sys.path.append(".")
 sys.path.append("..")
 
+import components.libraryprovider
 from components.libraryprovider import LibraryProvider, Library
 from tests.mock_commandprovider import TestCommandProvider
 from components.logging import SimpleLoggerConfig
@@ -128,14 +131,25 @@ LIBRARY_FIND_OUTPUT = "\n".join([f.replace("/", os.path.sep) for f in [
 ]]).format(os.getcwd())
 
 
+def TEMP_FIND_OUTPUT(command):
+    # The moz.yaml files in a temporary gecko_path; the command ends with it
+    # (Windows) or has it as its second argument (find)
+    gecko_path = command.split(" ")[1] if command.startswith("find") else os.path.dirname(command.split(" ")[-1])
+    found = []
+    for root, dirs, files in os.walk(gecko_path):
+        if "moz.yaml" in files:
+            found.append(os.path.join(root, "moz.yaml"))
+    return "\n".join(found)
+
+
 class TestLibraryProvider(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         # We will need a CommandProvider, so instatiate that directly
         cls.commandProvider = TestCommandProvider({
             'test_mappings': {
-                "find": lambda x: LIBRARY_FIND_OUTPUT,
-                "dir": lambda x: LIBRARY_FIND_OUTPUT
+                "find": lambda x: LIBRARY_FIND_OUTPUT if os.getcwd() in x else TEMP_FIND_OUTPUT(x),
+                "dir": lambda x: LIBRARY_FIND_OUTPUT if os.getcwd() in x else TEMP_FIND_OUTPUT(x)
             }
         })
         # And provide it with a logger
@@ -148,6 +162,7 @@ class TestLibraryProvider(unittest.TestCase):
             'CommandProvider': cls.commandProvider
         })
         cls.libraryprovider.update_config(additional_config)
+        cls.additional_config = additional_config
 
     def testLibraryFindAndImport(self):
         libs = self.libraryprovider.get_libraries(os.getcwd())
@@ -330,6 +345,67 @@ updatebot:
                 continue
             self.assertFalse(vector, "The test vector '%s' did not raise an expected exception." % vector[0])
 
+    def testLibraryIndex(self):
+        gecko_path = tempfile.mkdtemp()
+        try:
+            os.makedirs(os.path.join(gecko_path, "libdav1d"))
+            mozyaml = os.path.join(gecko_path, "libdav1d", "moz.yaml")
+            shutil.copy(os.path.join(os.getcwd(), ".github", "gecko-test", "libdav1d", "moz.yaml"), mozyaml)
+            index_path = os.path.join(gecko_path, "index.json")
+
+            def get_libraries():
+                libraryprovider = LibraryProvider({'index_path': index_path})
+                libraryprovider.update_config(self.additional_config)
+                parsed = []
+                read = []
+                original = LibraryProvider._validate_library_dict
+
+                def _validate_library_dict(yaml_contents, yaml_path):
+                    parsed.append(yaml_path)
+                    return original(yaml_contents, yaml_path)
+
+                def _open(path, *args, **kwargs):
+                    if path.endswith("moz.yaml"):
+                        read.append(path)
+                    return open(path, *args, **kwargs)
+                try:
+                    LibraryProvider._validate_library_dict = staticmethod(_validate_library_dict)
+                    components.libraryprovider.open = _open
+                    libs = libraryprovider.get_libraries(gecko_path)
+                finally:
+                    LibraryProvider._validate_library_dict = staticmethod(original)
+                    del components.libraryprovider.open
+                return libs, parsed, read
+
+            libs, parsed, _ = get_libraries()
+            self.assertEqual(parsed, [os.path.join("libdav1d", "moz.yaml")])
+            self.assertTrue(os.path.exists(index_path))
+
+            # A second run doesn't read anything, and gives us the same libraries
+            indexed_libs, parsed, read = get_libraries()
+            self.assertEqual(parsed, [])
+            self.assertEqual(read, [])
+            self.assertEqual(indexed_libs, libs)
+
+            # Touching the file without changing it doesn't cause a re-parse either
+            os.utime(mozyaml, (0, 0))
+            _, parsed, read = get_libraries()
+            self.assertEqual(parsed, [])
+            self.assertEqual(read, [mozyaml])
+
+            # And its new mtime is remembered, so the next run doesn't even read it
+            _, parsed, read = get_libraries()
+            self.assertEqual(parsed, [])
+            self.assertEqual(read, [])
+
+            # But changing it does
+            with open(mozyaml, "a") as f:
+                f.write("\n# A comment\n")
+            _, parsed, _ = get_libraries()
+            self.assertEqual(parsed, [os.path.join("libdav1d", "moz.yaml")])
+        finally:
+            shutil.rmtree(gecko_path, ignore_errors=True)
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=0)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import sys
+import unittest
+
+import sentry_sdk
+from sentry_sdk import configure_scope
+
+sys.path.append(".")
+sys.path.append("..")
+
+from components.logging import LoggingProvider, LazyString, LogLevel, _format_breadcrumbs
+
+
+class TestLoggingProvider(unittest.TestCase):
+    def testLazyStringsNotFormatted(self):
+        formatted = []
+
+        def lazy(level):
+            return LazyString(lambda: formatted.append(level) or level.name)
+
+        # Sentry at its defaults, as in production, but sending its events to us
+        events = []
+        sentry_sdk.init(dsn='https://foo@sentry.example.com/1', transport=lambda event: events.append(event))
+        provider = LoggingProvider({
+            'sentry': True,
+            'sentry_config': {'url': 'https://foo@sentry.example.com/1'},
+        })
+        try:
+            with configure_scope() as scope:
+                scope.clear_breadcrumbs()
+                scope.add_event_processor(_format_breadcrumbs)
+
+            # Every message is kept as a breadcrumb, but not formatted
+            provider.log("Arguments:", lazy(LogLevel.Debug2), level=LogLevel.Debug2)
+            provider.log("Returned:", lazy(LogLevel.Debug), level=LogLevel.Debug)
+            self.assertEqual(formatted, [])
+
+            # Until we send an event
+            sentry_sdk.capture_message("Something went wrong")
+            self.assertEqual(formatted, [LogLevel.Debug2, LogLevel.Debug])
+            self.assertEqual([b['message'] for b in events[0]['breadcrumbs']['values']], ["Arguments: Debug2", "Returned: Debug"])
+        finally:
+            with configure_scope() as scope:
+                scope.clear()
+            sentry_sdk.init()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=0)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import json
+import inspect
+
+from http import server
+from urllib.parse import parse_qs
+
+from components.logging import log, LogLevel
+
+CONDUIT_PORT = 27492
+CONDUIT_URL = "http://localhost:%s/" % CONDUIT_PORT
+
+
+def MockConduitServerFactory(mappings):
+    """
+    Serves the Conduit API from mappings. A call is looked up in the mappings by
+    its method, or for revision edits first by method:transaction-type. Like the
+    command mappings, a callback may take a parameter (the JSON of the call's
+    parameters) and returns the JSON Conduit would, as arc printed it.
+    """
+    class MockConduitServer(server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            size = int(self.headers.get('content-length'))
+            form = parse_qs(self.rfile.read(size).decode("utf-8"))
+            params = json.loads(form['params'][0])
+            params.pop('__conduit__', None)
+            method = self.path[len("/api/"):]
+
+            keys = [method]
+            if 'transactions' in params:
+                keys = [method + ":" + t['type'] for t in params['transactions']] + keys
+
+            response = {"result": None, "error_code": "ERR-MOCK", "error_info": "MockConduitServer got a call to %s it didn't expect" % method}
+            for k in keys:
+                if k in mappings:
+                    log("MockConduitServer: Responding to %s" % k, level=LogLevel.Info)
+                    func = mappings[k]
+                    if len(inspect.signature(func).parameters) > 0:
+                        output = func(json.dumps(params))
+                    else:
+                        output = func()
+                    result = json.loads(output)
+                    response = {"result": result['response'], "error_code": result['error'], "error_info": result['errorMessage']}
+                    break
+
+            self.send_response(200)
+            self.send_header("Content-type", "application/json")
+            self.end_headers()
+            self.wfile.write(json.dumps(response).encode())
+
+        def log_message(self, format, *args):
+            pass
+    return MockConduitServer
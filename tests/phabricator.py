@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from http import server
+from threading import Thread
+from urllib.parse import parse_qs
+
+sys.path.append(".")
+sys.path.append("..")
+from apis.phabricator import ConduitClient, ConduitError, PhabricatorProvider
+from components.commandprovider import CommandProvider
+from components.logging import SimpleLoggerConfig
+
+
+KNOWN_PHIDS = {
+    "user.search": {"tjr": "PHID-USER-abc", "sylvestre": "PHID-USER-def"},
+    "project.search": {"media-playback-reviewers": "PHID-PROJ-ghi"},
+}
+
+
+class MockConduitServer(server.BaseHTTPRequestHandler):
+    requests = []
+
+    def do_POST(self):
+        size = int(self.headers.get('content-length'))
+        form = parse_qs(self.rfile.read(size).decode("utf-8"))
+        params = json.loads(form['params'][0])
+        MockConduitServer.requests.append((self.path, params))
+
+        self.send_response(200)
+        self.send_header("Content-type", "application/json")
+        self.end_headers()
+
+        if self.path in ["/api/user.search", "/api/project.search"]:
+            method = self.path[len("/api/"):]
+            field = "username" if method == "user.search" else "slug"
+            # Slugs may be given with a leading #, but are returned without it
+            names = [n.lstrip("#") for n in list(params['constraints'].values())[0]]
+            data = [{"phid": KNOWN_PHIDS[method][n], "fields": {field: n}} for n in names if n in KNOWN_PHIDS[method]]
+            response = {"result": {"data": data}, "error_code": None, "error_info": None}
+        elif self.path == "/api/differential.revision.edit" and params['transactions'][0]['type'] == "abandon":
+            response = {"result": None, "error_code": "ERR-CONDUIT-CORE", "error_info": "You can not abandon this revision because it has already been closed."}
+        elif self.path == "/api/differential.revision.edit":
+            response = {"result": {"object": {"id": int(params['objectIdentifier'])}}, "error_code": None, "error_info": None}
+        else:
+            assert False, "Got a path %s I didn't expect" % self.path
+        self.wfile.write(json.dumps(response).encode())
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestConduitClient(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = server.HTTPServer(('', 27491), MockConduitServer)
+        t = Thread(target=cls.server.serve_forever)
+        t.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def testCalls(self):
+        client = ConduitClient("http://localhost:27491/", "api-token")
+
+        self.assertEqual(client.search("user.search", {"usernames": ["tjr"]})[0]['phid'], "PHID-USER-abc")
+        path, params = MockConduitServer.requests[-1]
+        self.assertEqual(params['constraints'], {"usernames": ["tjr"]})
+        self.assertEqual(params['__conduit__'], {"token": "api-token"})
+
+        transactions = [{"type": "bugzilla.bug-id", "value": "1234"}, {"type": "parents.add", "value": ["PHID-DREV-1"]}]
+        client.edit_revision("83050", transactions)
+        path, params = MockConduitServer.requests[-1]
+        self.assertEqual(params['transactions'], transactions)
+        self.assertEqual(params['objectIdentifier'], "83050")
+
+        with self.assertRaises(ConduitError) as cm:
+            client.edit_revision("83050", [{"type": "abandon", "value": True}])
+        self.assertIn("already been closed", cm.exception.error_info)
+
+    def testReviewerPHIDs(self):
+        requests = MockConduitServer.requests
+        cache_dir = tempfile.mkdtemp()
+
+        def provider():
+            p = PhabricatorProvider({
+                'url': 'http://localhost:27491/',
+                'apikey': 'api-token',
+                'phid_cache_path': cache_dir,
+            })
+            p.update_config(dict(SimpleLoggerConfig, CommandProvider=CommandProvider({})))
+            return p
+
+        try:
+            phabricatorProvider = provider()
+
+            # All the reviewers are looked up with one search per type; duplicates are only asked about once
+            num_requests = len(requests)
+            phabricatorProvider.prefetch_reviewer_phids(["tjr", "sylvestre", "#media-playback-reviewers", "tjr", "nobody", None])
+            self.assertEqual(requests[num_requests:], [
+                ("/api/user.search", {"constraints": {"usernames": ["nobody", "sylvestre", "tjr"]}, "__conduit__": {"token": "api-token"}}),
+                ("/api/project.search", {"constraints": {"slugs": ["#media-playback-reviewers"]}, "__conduit__": {"token": "api-token"}}),
+            ])
+
+            # A prefetched reviewer is set without looking them up again
+            num_requests = len(requests)
+            phabricatorProvider.set_reviewer("83050", "#media-playback-reviewers")
+            self.assertEqual(len(requests), num_requests + 1)
+            self.assertEqual(requests[-1][1]['transactions'], [{"type": "reviewers.set", "value": ["PHID-PROJ-ghi"]}])
+
+            # And the PHIDs are remembered by later runs
+            phabricatorProvider = provider()
+            num_requests = len(requests)
+            phabricatorProvider.prefetch_reviewer_phids(["tjr", "sylvestre", "#media-playback-reviewers"])
+            phabricatorProvider.set_reviewer("83050", "sylvestre")
+            self.assertEqual(len(requests), num_requests + 1)
+            self.assertEqual(requests[-1][1]['transactions'], [{"type": "reviewers.set", "value": ["PHID-USER-def"]}])
+        finally:
+            shutil.rmtree(cache_dir)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=0)
@@ -41,6 +41,8 @@ class TestCommandRunner(unittest.TestCase):
         self.assertEqual(alice.f, config1['f'], "Did not populate alice.f correctly")
         self.assertEqual(alice.run, tcp.run, "Did not populate alice.run correctly")
         self.assertNotEqual(alice.logger, None, "Did not populate alice.logger correctly")
+        self.assertEqual(alice.logger.provider, lp, "alice.logger should share the LoggingProvider rather than copy it")
+        self.assertEqual(alice.logger.category, "FakeProvider", "Did not populate alice.logger's category correctly")
 
     def testString(self):
         should_be_string = ("hello" + "world") if True else ""
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import sys
+import unittest
+from threading import Thread
+
+sys.path.append(".")
+sys.path.append("..")
+
+from components.timing import Timings, command_span_name, http_span_name, query_span_name
+
+
+class TestTimings(unittest.TestCase):
+    def testAggregation(self):
+        t = Timings()
+        t.record("db", "SELECT jobs", 1.0)
+        t.set_library("dav1d")
+        t.record("db", "SELECT jobs", 3.0)
+        with t.span("http", "GET example.com/api"):
+            pass
+
+        # Spans made on another thread are attributed to that thread's library
+        def other_library():
+            t.set_library("aom")
+            t.record("subprocess", "git fetch", 2.0)
+        thread = Thread(target=other_library)
+        thread.start()
+        thread.join()
+
+        summary = t.summary()
+        self.assertEqual(summary['phases']['db']['SELECT jobs'], {'count': 2, 'total': 4.0, 'max': 3.0})
+        self.assertEqual(summary['phases']['http']['GET example.com/api']['count'], 1)
+        self.assertEqual(summary['libraries']['dav1d']['db'], 3.0)
+        self.assertTrue('http' in summary['libraries']['dav1d'])
+        self.assertEqual(summary['libraries']['aom'], {'subprocess': 2.0})
+
+        t.reset()
+        self.assertEqual(t.summary()['phases'], {})
+
+    def testSpanNames(self):
+        self.assertEqual(command_span_name(["git", "log", "--oneline"]), "git log")
+        self.assertEqual(command_span_name("dir /B /S"), "dir /B")
+        self.assertEqual(http_span_name("get", "https://bugzilla.mozilla.org/rest/bug/1234?api_key=foo"), "GET bugzilla.mozilla.org/rest/bug")
+        self.assertEqual(http_span_name("post", "https://treeherder.mozilla.org/api/jobs/?push_id=5&page=2"), "POST treeherder.mozilla.org/api/jobs")
+        self.assertEqual(query_span_name("SELECT c.* FROM try_runs as c INNER JOIN jobs as j"), "SELECT try_runs")
+        self.assertEqual(query_span_name("INSERT INTO job_to_ff_version(job_id, ff_version) VALUES(%s, %s)"), "INSERT job_to_ff_version")
+        self.assertEqual(query_span_name("UPDATE jobs SET status=%s WHERE id = %s"), "UPDATE jobs")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=0)
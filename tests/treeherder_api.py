@@ -7,6 +7,9 @@
 import os
 import sys
 import json
+import time
+import shutil
+import tempfile
 import unittest
 
 from http import server
@@ -15,7 +18,7 @@ from threading import Thread
 sys.path.append(".")
 sys.path.append("..")
 from components.logging import SimpleLoggerConfig
-from components.utilities import static_vars
+from components.utilities import static_vars, Struct, merge_dictionaries, PUSH_HEALTH_IGNORED_DICTS, PUSH_HEALTH_IGNORED_KEYS
 from apis.taskcluster import TaskclusterProvider
 
 from tests.functionality_utilities import treeherder_response
@@ -86,6 +89,35 @@ class TestTaskclusterProvider(unittest.TestCase):
         job_list = self.taskclusterProvider.get_job_details('1')
         self.assertEqual(len(job_list), 3737, "Did not receive the correct number of jobs from the server.")
 
+    def test_job_details_pages_concurrently(self):
+        def fake_page(push_id, url):
+            page = int(url[url.index("page=") + len("page="):])
+            # Make the later pages come back first
+            time.sleep(0.01 * (5 - page))
+            return {'results': [page], 'job_property_names': ['p'], 'next': url.replace("page=%s" % page, "page=%s" % (page + 1)) if page < 5 else None}
+
+        first_page = {'count': 5, 'results': [1], 'job_property_names': ['p'], 'next': "http://localhost:27490/jobs/?push_id=1&page=2"}
+        original = self.taskclusterProvider._get_job_details_page
+        try:
+            self.taskclusterProvider._get_job_details_page = fake_page
+            pages = self.taskclusterProvider._get_job_details_pages_concurrently(1, first_page)
+        finally:
+            self.taskclusterProvider._get_job_details_page = original
+
+        self.assertEqual([p['results'][0] for p in pages], [2, 3, 4, 5])
+        self.assertEqual([p['next'] for p in pages], [None, None, None, None])
+
+    def test_job_details_and_push_health(self):
+        # Every concurrent get_job_details can fetch pages concurrently, and the session has a connection for each
+        adapter = self.taskclusterProvider.session.get_adapter(self.taskclusterProvider.url_treeherder)
+        self.assertEqual(adapter._pool_maxsize, self.taskclusterProvider.max_concurrent_requests ** 2)
+
+        results = self.taskclusterProvider.get_job_details_and_push_health(['health_rev', 'health_rev'])
+        self.assertEqual(len(results), 2)
+        for job_list, push_health in results:
+            self.assertEqual(len(job_list), len(self.taskclusterProvider.get_job_details('health_rev')))
+            self.assertEqual(len(push_health['metrics']['tests']['details']['needInvestigation']), 38, "Did not get expected number of needs-investigation tests")
+
     def test_push_health(self):
         push_health = self.taskclusterProvider.get_push_health("health_rev")
         self.assertEqual(len(push_health['metrics']['tests']['details']['needInvestigation']), 38, "Did not get expected number of needs-investigation tests")
@@ -117,6 +149,32 @@ class TestTaskclusterProvider(unittest.TestCase):
         self.assertEqual(len(combined_health['metrics']['tests']['details']['needInvestigation']), 43 + 7, "Did not get expected number of needs-investigation tests")
         self.assertEqual(len(combined_health['metrics']['tests']['details']['knownIssues']), 0 + 2, "Did not get expected number of known-issue tests")
 
+    def test_combine_order(self):
+        file_prefix = "tests/" if not os.getcwd().endswith("tests") else ""
+        file_prefix += "treeherder_api_responses/"
+
+        for platforms in [("classified_failures_linuxonly", "classified_failures_notlinux"),
+                          ("unclassified_failures_linuxonly_before_retriggers", "unclassified_failures_notlinux_before_retriggers"),
+                          ("unclassified_failures_linuxonly_multiple_per_test", "unclassified_failures_notlinux_multiple_per_test")]:
+            def healths():
+                for p in platforms:
+                    with open(file_prefix + "health_" + p + ".txt") as f:
+                        yield json.load(f)
+
+            # The failures must come out in the order merging the whole documents put them in
+            expected = {}
+            for h in healths():
+                expected = merge_dictionaries(expected, h, ignored_dicts=PUSH_HEALTH_IGNORED_DICTS, ignored_keys=PUSH_HEALTH_IGNORED_KEYS)
+            combined = {}
+            for h in healths():
+                combined = self.taskclusterProvider.combine_push_healths(combined, h)
+
+            for k in TaskclusterProvider.PUSH_HEALTH_DETAILS:
+                self.assertEqual(
+                    [t['testName'] for t in combined['metrics']['tests']['details'][k]],
+                    [t['testName'] for t in expected['metrics']['tests']['details'][k]])
+                self.assertEqual(combined['metrics']['tests']['details'][k], expected['metrics']['tests']['details'][k])
+
     def test_correlation(self):
         job_list = self.taskclusterProvider.get_job_details('health_rev')
         push_health = self.taskclusterProvider.get_push_health("health_rev")
@@ -125,6 +183,19 @@ class TestTaskclusterProvider(unittest.TestCase):
 
         self.assertEqual(len(results['to_retrigger']), 26, "Did not get the expected number of jobs to retrigger.")
 
+        indexes = [
+            (results['tasks_by_testname'], results['failed_tests_by_classification']),
+            (results['tasks_by_jobname'], results['failed_jobs_by_classification'])
+        ]
+        for (groups, by_classification) in indexes:
+            failed_groups = [name for name in groups if groups[name].failed()]
+            self.assertEqual(sorted(failed_groups), sorted(name for c in by_classification for (name, group) in by_classification[c]))
+            for c in by_classification:
+                for (name, group) in by_classification[c]:
+                    self.assertEqual(group.classification, c)
+                    self.assertEqual(group.failed_count, len([t for t in group.all() if t.failed]))
+                    self.assertEqual(set(group.failed_task_ids()), set(t.task_id for t in group.failed()))
+
         return  # Debugging code below
         print("Known Issues:")
         for t in results['known_issues']:
@@ -161,6 +232,8 @@ class TestTaskclusterProvider(unittest.TestCase):
         self.assertEqual(data[1].hello, "WHAT")
         self.assertEqual(data[1].world, "UP")
         self.assertEqual(data[1].decision_task.hello, "WHAT")
+        self.assertEqual(data[1].job_type_name, "Gecko Decision Task")
+        self.assertFalse(hasattr(data[0], 'goodbye'))
 
     def test_retrigger(self):
         job_list = self.taskclusterProvider.get_job_details('1')
@@ -168,6 +241,72 @@ class TestTaskclusterProvider(unittest.TestCase):
         decision_tasks = self.taskclusterProvider.retrigger_jobs(to_retrigger)
         self.assertEqual(EXPECTED_RETRIGGER_DECISION_TASK, decision_tasks[0])
 
+    def test_retrigger_order(self):
+        def fake_retrigger(decision_task, to_retrigger):
+            # Make the later groups finish first
+            time.sleep(0.01 * (5 - decision_task.task_id))
+            return "retrigger-%s" % decision_task.task_id
+
+        decision_tasks = [Struct(**{'task_id': i}) for i in range(5)]
+        to_retrigger = [Struct(**{'job_type_name': "job-%s" % i, 'decision_task': decision_tasks[i]}) for i in range(5)]
+
+        original = self.taskclusterProvider._retrigger_decision_task_group
+        try:
+            self.taskclusterProvider._retrigger_decision_task_group = fake_retrigger
+            decision_task_ids = self.taskclusterProvider.retrigger_jobs(to_retrigger)
+        finally:
+            self.taskclusterProvider._retrigger_decision_task_group = original
+
+        self.assertEqual(decision_task_ids, ["retrigger-%s" % i for i in range(5)])
+
+    def test_actions_cache(self):
+        job_list = self.taskclusterProvider.get_job_details('1')
+        decision_task_id = job_list[0].decision_task.task_id
+
+        self.taskclusterProvider._actions_cache.clear()
+        actions = self.taskclusterProvider._get_actions(decision_task_id)
+        original = self.taskclusterProvider.session
+        try:
+            self.taskclusterProvider.session = None
+            self.assertEqual(actions, self.taskclusterProvider._get_actions(decision_task_id))
+        finally:
+            self.taskclusterProvider.session = original
+
+    def test_artifact_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        try:
+            provider = TaskclusterProvider({
+                'url_treeherder': 'http://localhost:27490/',
+                'url_taskcluster': 'http://localhost:27490/',
+                'artifact_cache_path': cache_dir,
+            })
+            provider.update_config(dict(SimpleLoggerConfig, CommandProvider=self.commandProvider))
+            job_list = provider.get_job_details('health_rev')
+            classifications = provider.failure_classifications
+
+            # Job lists can gain retriggered jobs, so they always expire
+            job_lists = 0
+            for f in os.listdir(cache_dir):
+                with open(os.path.join(cache_dir, f)) as entry_file:
+                    entry = json.load(entry_file)
+                if isinstance(entry['value'], dict) and 'job_property_names' in entry['value']:
+                    self.assertNotEqual(entry['expires'], None)
+                    job_lists += 1
+            self.assertEqual(job_lists, 1)
+
+            # A new provider (i.e. a new run) doesn't need to talk to the server
+            provider = TaskclusterProvider({
+                'url_treeherder': 'http://localhost:27490/',
+                'url_taskcluster': 'http://localhost:27490/',
+                'artifact_cache_path': cache_dir,
+            })
+            provider.update_config(dict(SimpleLoggerConfig, CommandProvider=self.commandProvider))
+            provider.session = None
+            self.assertEqual([j.task_id for j in provider.get_job_details('health_rev')], [j.task_id for j in job_list])
+            self.assertEqual(provider.failure_classifications, classifications)
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=0)